@@ -234,19 +234,46 @@ class AdminApp {
                 body: JSON.stringify({
                     prompt,
                     model,
-                    max_tokens: maxTokens
+                    max_tokens: maxTokens,
+                    stream: true
                 })
             });
 
-            const data = await response.json();
-
             if (!response.ok) {
+                const data = await response.json();
                 throw new Error(data.error || 'Generation failed');
             }
 
-            // Display generated content
-            contentEl.textContent = data.content;
+            // Display generated content as it streams in
+            contentEl.textContent = '';
             outputEl.style.display = 'block';
+            loadingEl.style.display = 'none';
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+
+                for (const event of events) {
+                    if (!event.startsWith('data: ')) continue;
+                    const data = JSON.parse(event.slice(6));
+
+                    if (data.error) {
+                        throw new Error(data.error);
+                    }
+                    if (data.text) {
+                        contentEl.textContent += data.text;
+                    }
+                }
+            }
+
             this.showToast('Content generated successfully!', 'success');
 
         } catch (error) {
@@ -349,13 +376,13 @@ class AdminApp {
                         </div>
                     </div>
                     <div class="history-actions">
-                        <button class="btn btn-sm" onclick="adminApp.copyToClipboard('${this.escapeHtml(item.generated_content)}')">
+                        <button class="btn btn-sm" onclick="adminApp.copyHistoryItem('${item.id}')">
                             📋 Copy
                         </button>
                     </div>
                 </div>
                 <div class="history-content">
-                    ${this.escapeHtml(this.truncate(item.generated_content, 300))}
+                    ${this.escapeHtml(this.truncate(item.preview, 300))}
                 </div>
             </div>
         `;
@@ -438,6 +465,31 @@ class AdminApp {
         `;
     }
 
+    /**
+     * Copy the full content of a history item to clipboard
+     */
+    async copyHistoryItem(contentId) {
+        try {
+            const response = await fetch(`${this.apiBaseUrl}/ai/history/${contentId}`, {
+                headers: {
+                    'Authorization': `Bearer ${this.token}`
+                }
+            });
+
+            const data = await response.json();
+
+            if (!response.ok) {
+                throw new Error(data.error || 'Failed to load content');
+            }
+
+            await navigator.clipboard.writeText(data.item.generated_content);
+            this.showToast('Copied to clipboard!', 'success');
+        } catch (error) {
+            console.error('Copy error:', error);
+            this.showToast('Failed to copy', 'error');
+        }
+    }
+
     /**
      * Copy text to clipboard
      */
@@ -4,11 +4,27 @@ This file serves as the entry point for all API requests in Vercel
 """
 import sys
 import os
+import threading
 
 # Add backend directory to path so we can import the Flask app
 backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
 sys.path.insert(0, backend_path)
 
+
+def _prewarm():
+    """Load the Supabase and configured AI provider SDKs while the Flask app is imported"""
+    try:
+        import admin_routes
+        admin_routes.get_supabase()
+        admin_routes.get_ai_client()
+    except Exception as e:
+        print(f"Prewarm failed: {e}")
+
+
+# Start SDK initialization in the background so it overlaps with the
+# app import instead of landing on the first request
+threading.Thread(target=_prewarm, daemon=True).start()
+
 from app import app
 
 # Vercel looks for 'app' or 'application' variable
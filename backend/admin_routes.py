@@ -2,77 +2,273 @@
 Admin Routes for Admin Panel
 Handles admin authentication, AI writing, and admin-specific operations
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import os
+import atexit
+import base64
+import queue
 import jwt as pyjwt
+from jwt.algorithms import HMACAlgorithm
 import hashlib
+import hmac
 import secrets
-from datetime import datetime, timedelta
-from functools import wraps
-import google.generativeai as genai
-from supabase import create_client, Client
+import ssl
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import wraps, lru_cache
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from cachetools import TTLCache
+import orjson
+
+from supabase_client import get_supabase
+
+# The Gemini and Anthropic SDKs are slow to import, so they are imported
+# on first use inside the functions below to keep cold starts fast.
 
 admin_bp = Blueprint('admin', __name__)
 
-# Initialize Supabase client
-supabase_url = os.getenv('SUPABASE_URL', '')
-supabase_key = os.getenv('SUPABASE_SERVICE_KEY', '')
-supabase: Client = None
+# AI provider for the writing assistant: 'gemini' (default) or 'anthropic'
+AI_DEFAULT_MODELS = {
+    'gemini': 'gemini-2.0-flash-exp',
+    'anthropic': 'claude-3-5-sonnet-20241022'
+}
+AI_MODEL_PREFIXES = {
+    'gemini': 'gemini-',
+    'anthropic': 'claude-'
+}
 
-if supabase_url and supabase_key:
-    try:
-        supabase = create_client(supabase_url, supabase_key)
-    except Exception as e:
-        print(f"Failed to initialize Supabase: {e}")
 
-# Initialize Google Gemini client
-gemini_client = None
-google_api_key = os.getenv('GOOGLE_API_KEY', '')
-if google_api_key:
+def _resolve_ai_provider(value: str) -> str:
+    """Normalize an AI_PROVIDER setting, falling back to gemini for unknown values"""
+    provider = value.strip().lower()
+    if provider not in AI_DEFAULT_MODELS:
+        print(f"Warning: unknown AI_PROVIDER '{value}', using gemini")
+        return 'gemini'
+    return provider
+
+
+AI_PROVIDER = _resolve_ai_provider(os.getenv('AI_PROVIDER', 'gemini'))
+
+
+@lru_cache(maxsize=1)
+def get_gemini():
+    """Get the shared Google Gemini model, initializing it on first use"""
+    google_api_key = os.getenv('GOOGLE_API_KEY', '')
+    if not google_api_key:
+        return None
+
     try:
+        import google.generativeai as genai
         genai.configure(api_key=google_api_key)
-        gemini_client = genai.GenerativeModel('gemini-2.0-flash-exp')
+        gemini_client = genai.GenerativeModel(AI_DEFAULT_MODELS['gemini'])
         print("✓ Google Gemini API initialized")
+        return gemini_client
     except Exception as e:
         print(f"Failed to initialize Gemini: {e}")
+        return None
+
+
+@lru_cache(maxsize=8)
+def get_gemini_model(model_name: str):
+    """Get a Gemini model by name, reusing the instance across requests"""
+    if model_name == AI_DEFAULT_MODELS['gemini']:
+        return get_gemini()
+
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name)
+
+
+@lru_cache(maxsize=1)
+def get_anthropic():
+    """Get the shared Anthropic client, initializing it on first use"""
+    anthropic_api_key = os.getenv('ANTHROPIC_API_KEY', '')
+    if not anthropic_api_key:
+        return None
+
+    try:
+        from anthropic import Anthropic
+        anthropic_client = Anthropic(api_key=anthropic_api_key)
+        print("✓ Anthropic API initialized")
+        return anthropic_client
+    except Exception as e:
+        print(f"Failed to initialize Anthropic: {e}")
+        return None
+
+
+def get_ai_client():
+    """Get the client for the configured AI provider"""
+    if AI_PROVIDER == 'anthropic':
+        return get_anthropic()
+    return get_gemini()
+
+
+# Activity log entries are inserted in the background so responses never
+# wait on Supabase. The queue is bounded; when it is full the oldest entry
+# is dropped.
+ACTIVITY_LOG_BATCH_SIZE = 50
+_activity_queue = queue.Queue(maxsize=512)
+_log_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='admin-log')
+
+# Serverless instances (Vercel) freeze once the response is sent and never
+# run the atexit drains, so there writes happen before responding instead
+WRITE_INLINE = bool(os.getenv('VERCEL'))
+
+
+def _check_crypto_backend():
+    """Warn when SHA-256 is not backed by an OpenSSL with SHA extension support"""
+    if hashlib.sha256.__name__ != 'openssl_sha256':
+        print("Warning: hashlib is using the builtin SHA-256, token hashing will be slow")
+    elif ssl.OPENSSL_VERSION_INFO < (1, 1, 1):
+        print(f"Warning: {ssl.OPENSSL_VERSION} predates SHA extension support, token hashing will be slow")
+
+
+_check_crypto_backend()
+
+# Argon2id hasher for admin passwords (OWASP minimum parameters)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+# Hash of a random throwaway password with the parameters above. Logins for
+# unknown emails verify against it so they take as long as real ones.
+_DUMMY_PASSWORD_HASH = '$argon2id$v=19$m=19456,t=2,p=1$noJT+1EZ46IknF7Or1w/0Q$T0huGQ0Ii31peJtXyKcFepBb8ADWKywY4twgByphs9s'
+
+# Successful verifications keyed by stored hash -> HMAC of the password.
+# The HMAC key only lives in this process, so the cache never holds
+# anything that could be used to recover or replay a password.
+_verify_cache_key = secrets.token_bytes(32)
+_verify_cache = TTLCache(maxsize=256, ttl=300)
+_verify_cache_lock = threading.Lock()
+
+# Decoded admin tokens keyed by a SHA256 of the raw token, so repeated
+# requests with the same token skip signature verification
+_token_cache = TTLCache(maxsize=1024, ttl=60)
+_token_cache_lock = threading.Lock()
+
+# Admin profiles by id, so frequent /verify polling skips Supabase
+_admin_cache = TTLCache(maxsize=256, ttl=30)
+_admin_cache_lock = threading.Lock()
+
+# Admin tokens stay valid for 24 hours
+TOKEN_LIFETIME_SECONDS = 24 * 60 * 60
+
+
+class _CachedHMACAlgorithm(HMACAlgorithm):
+    """HS256 that reuses the keyed HMAC state instead of rehashing the key on every call"""
+
+    def __init__(self):
+        super().__init__(HMACAlgorithm.SHA256)
+
+    def sign(self, msg: bytes, key: bytes) -> bytes:
+        """Sign msg by copying the cached keyed state"""
+        mac = _hmac_state(key).copy()
+        mac.update(msg)
+        return mac.digest()
+
+    def verify(self, msg: bytes, key: bytes, sig: bytes) -> bool:
+        """Constant-time signature check"""
+        return hmac.compare_digest(sig, self.sign(msg, key))
+
+
+@lru_cache(maxsize=4)
+def _hmac_state(key: bytes):
+    """HMAC-SHA256 state with the key already absorbed"""
+    return hmac.new(key, digestmod=hashlib.sha256)
+
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded base64url encoding used by JWT segments"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+# Every admin token has the same header, so encode it once
+_TOKEN_HEADER_SEGMENT = _b64url(b'{"alg":"HS256","typ":"JWT"}')
+
+# Private JWS instance so the global PyJWT registry (used by
+# flask_jwt_extended) is left untouched
+_jws = pyjwt.PyJWS(algorithms=['HS256'])
+_jws.unregister_algorithm('HS256')
+_jws.register_algorithm('HS256', _CachedHMACAlgorithm())
 
 
 def hash_password(password: str) -> str:
-    """Simple password hashing using SHA256 (use bcrypt in production)"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password using Argon2id"""
+    return password_hasher.hash(password)
+
+
+def _password_digest(password: str) -> bytes:
+    """Keyed digest used to match a password against the verify cache"""
+    return hmac.new(_verify_cache_key, password.encode(), hashlib.sha256).digest()
 
 
 def verify_password(password: str, password_hash: str) -> bool:
-    """Verify password against hash"""
-    return hash_password(password) == password_hash
+    """Verify password against hash, skipping the KDF for recent successful logins"""
+    digest = _password_digest(password)
+    with _verify_cache_lock:
+        cached = _verify_cache.get(password_hash)
+    if cached is not None and hmac.compare_digest(cached, digest):
+        return True
+
+    if password_hash.startswith('$argon2'):
+        try:
+            valid = password_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            valid = False
+    else:
+        # Legacy unsalted SHA256 hashes created before the Argon2 migration
+        legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+        valid = hmac.compare_digest(legacy_hash, password_hash)
+
+    if valid:
+        with _verify_cache_lock:
+            _verify_cache[password_hash] = digest
+    return valid
 
 
 def generate_token(admin_id: str, email: str) -> str:
     """Generate JWT token for admin"""
     secret_key = os.getenv('SECRET_KEY', 'dev-secret-key')
-    expiration = datetime.utcnow() + timedelta(hours=24)
+    issued_at = int(time.time())
 
     payload = {
         'admin_id': admin_id,
         'email': email,
-        'exp': expiration,
-        'iat': datetime.utcnow()
+        'exp': issued_at + TOKEN_LIFETIME_SECONDS,
+        'iat': issued_at
     }
 
-    return pyjwt.encode(payload, secret_key, algorithm='HS256')
+    signing_input = _TOKEN_HEADER_SEGMENT + b'.' + _b64url(orjson.dumps(payload))
+    mac = _hmac_state(secret_key.encode()).copy()
+    mac.update(signing_input)
+    return (signing_input + b'.' + _b64url(mac.digest())).decode()
 
 
 def verify_token(token: str) -> dict:
     """Verify JWT token"""
+    cache_key = hashlib.sha256(token.encode()).digest()
+    with _token_cache_lock:
+        payload = _token_cache.get(cache_key)
+    if payload is not None:
+        # The cache TTL may outlive the token itself
+        return payload if payload['exp'] > time.time() else None
+
     try:
         secret_key = os.getenv('SECRET_KEY', 'dev-secret-key')
-        payload = pyjwt.decode(token, secret_key, algorithms=['HS256'])
-        return payload
-    except pyjwt.ExpiredSignatureError:
+        payload = orjson.loads(_jws.decode(token, secret_key, algorithms=['HS256']))
+    except (pyjwt.InvalidTokenError, ValueError):
+        return None
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('exp'), int):
         return None
-    except pyjwt.InvalidTokenError:
+    if payload['exp'] <= time.time():
         return None
 
+    with _token_cache_lock:
+        _token_cache[cache_key] = payload
+    return payload
+
 
 def require_admin_auth(f):
     """Decorator to require admin authentication"""
@@ -101,27 +297,34 @@ def require_admin_auth(f):
 
 
 def init_admin_user():
-    """Initialize default admin user if not exists"""
+    """Initialize default admin user if not exists
+
+    Set ADMIN_BOOTSTRAPPED=1 once the admin exists to skip this entirely,
+    and ADMIN_PASSWORD_HASH to reuse a precomputed hash instead of
+    hashing ADMIN_PASSWORD on every start.
+    """
+    if os.getenv('ADMIN_BOOTSTRAPPED') == '1':
+        return
+
+    supabase = get_supabase()
     if not supabase:
         print("Warning: Supabase not configured. Admin user creation skipped.")
         return
 
     try:
         admin_email = os.getenv('ADMIN_EMAIL', 'admin@example.com')
-        admin_password = os.getenv('ADMIN_PASSWORD', 'Admin123!')
-
-        # Check if admin exists
-        response = supabase.table('admin_users').select('*').eq('email', admin_email).execute()
-
-        if not response.data:
-            # Create admin user
-            password_hash = hash_password(admin_password)
-            supabase.table('admin_users').insert({
-                'email': admin_email,
-                'password_hash': password_hash,
-                'full_name': 'System Administrator',
-                'is_active': True
-            }).execute()
+        password_hash = os.getenv('ADMIN_PASSWORD_HASH') or \
+            hash_password(os.getenv('ADMIN_PASSWORD', 'Admin123!'))
+
+        # Insert the admin unless one with this email already exists
+        response = supabase.table('admin_users').upsert({
+            'email': admin_email,
+            'password_hash': password_hash,
+            'full_name': 'System Administrator',
+            'is_active': True
+        }, on_conflict='email', ignore_duplicates=True).execute()
+
+        if response.data:
             print(f"✓ Admin user created: {admin_email}")
         else:
             print(f"✓ Admin user already exists: {admin_email}")
@@ -130,19 +333,62 @@ def init_admin_user():
 
 
 def log_activity(admin_id: str, action: str, details: dict = None):
-    """Log admin activity"""
+    """Queue admin activity for a background insert"""
+    if not get_supabase():
+        return
+
+    # request is thread-local, so capture everything needed up front
+    entry = {
+        'admin_id': admin_id,
+        'action': action,
+        'details': details or {},
+        'ip_address': request.remote_addr
+    }
+
+    while True:
+        try:
+            _activity_queue.put_nowait(entry)
+            break
+        except queue.Full:
+            try:
+                _activity_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+    if WRITE_INLINE:
+        flush_activity_log()
+    else:
+        _log_executor.submit(flush_activity_log)
+
+
+def flush_activity_log():
+    """Insert queued activity log entries in batches"""
+    supabase = get_supabase()
     if not supabase:
         return
 
-    try:
-        supabase.table('admin_activity_log').insert({
-            'admin_id': admin_id,
-            'action': action,
-            'details': details or {},
-            'ip_address': request.remote_addr
-        }).execute()
-    except Exception as e:
-        print(f"Error logging activity: {e}")
+    while True:
+        batch = []
+        while len(batch) < ACTIVITY_LOG_BATCH_SIZE:
+            try:
+                batch.append(_activity_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if not batch:
+            return
+
+        try:
+            supabase.table('admin_activity_log').insert(batch).execute()
+        except Exception as e:
+            print(f"Error logging activity: {e}")
+
+
+@atexit.register
+def _drain_activity_log():
+    """Write any pending activity log entries before the process exits"""
+    _log_executor.shutdown(wait=True)
+    flush_activity_log()
 
 
 # =============================================================================
@@ -160,14 +406,20 @@ def admin_login():
     email = data['email']
     password = data['password']
 
+    supabase = get_supabase()
     if not supabase:
         return jsonify({'error': 'Admin system not configured'}), 500
 
     try:
         # Get admin user
-        response = supabase.table('admin_users').select('*').eq('email', email).eq('is_active', True).execute()
+        response = supabase.table('admin_users')\
+            .select('id,email,full_name,password_hash')\
+            .eq('email', email)\
+            .eq('is_active', True)\
+            .execute()
 
         if not response.data:
+            verify_password(password, _DUMMY_PASSWORD_HASH)
             return jsonify({'error': 'Invalid credentials'}), 401
 
         admin = response.data[0]
@@ -179,13 +431,15 @@ def admin_login():
         # Generate token
         token = generate_token(admin['id'], admin['email'])
 
-        # Update last login
-        supabase.table('admin_users').update({
-            'last_login': datetime.utcnow().isoformat()
-        }).eq('id', admin['id']).execute()
+        # Update last login and log activity in one round trip
+        supabase.rpc('admin_record_login', {
+            'p_admin_id': admin['id'],
+            'p_ip': request.remote_addr,
+            'p_details': {'email': email}
+        }).execute()
 
-        # Log activity
-        log_activity(admin['id'], 'login', {'email': email})
+        with _admin_cache_lock:
+            _admin_cache.pop(admin['id'], None)
 
         return jsonify({
             'success': True,
@@ -206,24 +460,31 @@ def admin_login():
 @require_admin_auth
 def verify_admin():
     """Verify admin token"""
+    with _admin_cache_lock:
+        admin = _admin_cache.get(request.admin_id)
+    if admin:
+        return jsonify({'valid': True, 'admin': admin}), 200
+
+    supabase = get_supabase()
     if not supabase:
         return jsonify({'error': 'Admin system not configured'}), 500
 
     try:
-        response = supabase.table('admin_users').select('*').eq('id', request.admin_id).execute()
+        response = supabase.table('admin_users')\
+            .select('id,email,full_name')\
+            .eq('id', request.admin_id)\
+            .execute()
 
         if not response.data:
             return jsonify({'error': 'Admin not found'}), 404
 
         admin = response.data[0]
+        with _admin_cache_lock:
+            _admin_cache[request.admin_id] = admin
 
         return jsonify({
             'valid': True,
-            'admin': {
-                'id': admin['id'],
-                'email': admin['email'],
-                'full_name': admin['full_name']
-            }
+            'admin': admin
         }), 200
 
     except Exception as e:
@@ -242,68 +503,119 @@ def admin_logout():
 # AI Writing Routes
 # =============================================================================
 
+def save_generated_content(admin_id: str, prompt: str, generated_content: str, model_name: str):
+    """Store generated content in the AI history table"""
+    supabase = get_supabase()
+    if not supabase:
+        return
+
+    # Calculate token usage (approximate)
+    token_count = len(generated_content.split())  # Rough estimate
+
+    try:
+        supabase.table('ai_generated_content').insert({
+            'admin_id': admin_id,
+            'prompt': prompt,
+            'generated_content': generated_content,
+            'model': model_name,
+            'metadata': {
+                'tokens': token_count,
+                'model_version': model_name
+            }
+        }).execute()
+    except Exception as e:
+        print(f"Error saving AI content: {e}")
+
+
+def _record_generation(prompt: str, generated_content: str, model_name: str):
+    """Save generated content and log the activity in the background"""
+    if WRITE_INLINE:
+        save_generated_content(request.admin_id, prompt, generated_content, model_name)
+    else:
+        _log_executor.submit(save_generated_content, request.admin_id, prompt, generated_content, model_name)
+    log_activity(request.admin_id, 'ai_generate', {
+        'prompt_length': len(prompt),
+        'response_length': len(generated_content),
+        'model': model_name
+    })
+
+
+def _sse(data: dict) -> str:
+    """Format a server-sent event"""
+    return f"data: {orjson.dumps(data).decode()}\n\n"
+
+
+def _generate_chunks(prompt: str, model_name: str, max_tokens: int):
+    """Yield generated text from the configured AI provider as it arrives"""
+    if AI_PROVIDER == 'anthropic':
+        with get_anthropic().messages.stream(
+            model=model_name,
+            max_tokens=max_tokens,
+            temperature=0.7,
+            messages=[{'role': 'user', 'content': prompt}]
+        ) as stream:
+            yield from stream.text_stream
+        return
+
+    model = get_gemini_model(model_name)
+
+    # Configure generation settings
+    generation_config = {
+        'max_output_tokens': max_tokens,
+        'temperature': 0.7,
+    }
+
+    for chunk in model.generate_content(prompt, generation_config=generation_config, stream=True):
+        yield chunk.text
+
+
 @admin_bp.route('/ai/generate', methods=['POST'])
 @require_admin_auth
 def generate_content():
-    """Generate content using AI"""
+    """Generate content using AI
+
+    Pass "stream": true to receive the output as server-sent events while
+    it is generated instead of a single JSON response.
+    """
     data = request.get_json()
 
     if not data or not data.get('prompt'):
         return jsonify({'error': 'Prompt is required'}), 400
 
-    if not gemini_client:
-        return jsonify({'error': 'AI service not configured. Please set GOOGLE_API_KEY in .env'}), 500
+    if not get_ai_client():
+        api_key_name = 'ANTHROPIC_API_KEY' if AI_PROVIDER == 'anthropic' else 'GOOGLE_API_KEY'
+        return jsonify({'error': f'AI service not configured. Please set {api_key_name} in .env'}), 500
 
     prompt = data['prompt']
-    model_name = data.get('model', 'gemini-2.0-flash-exp')
+    model_name = data.get('model') or ''
     max_tokens = data.get('max_tokens', 2000)
 
-    try:
-        # Select the appropriate Gemini model
-        if model_name != gemini_client.model_name:
-            model = genai.GenerativeModel(model_name)
-        else:
-            model = gemini_client
-
-        # Configure generation settings
-        generation_config = {
-            'max_output_tokens': max_tokens,
-            'temperature': 0.7,
-        }
-
-        # Generate content using Gemini
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
-
-        generated_content = response.text
+    # Fall back to the provider's default for models from another provider
+    if not isinstance(model_name, str) or not model_name.startswith(AI_MODEL_PREFIXES[AI_PROVIDER]):
+        model_name = AI_DEFAULT_MODELS[AI_PROVIDER]
 
-        # Calculate token usage (approximate)
-        token_count = len(generated_content.split())  # Rough estimate
-
-        # Save to database
-        if supabase:
+    if data.get('stream'):
+        def generate():
+            chunks = []
             try:
-                supabase.table('ai_generated_content').insert({
-                    'admin_id': request.admin_id,
-                    'prompt': prompt,
-                    'generated_content': generated_content,
-                    'model': model_name,
-                    'metadata': {
-                        'tokens': token_count,
-                        'model_version': model_name
-                    }
-                }).execute()
+                for text in _generate_chunks(prompt, model_name, max_tokens):
+                    chunks.append(text)
+                    yield _sse({'text': text})
+                yield _sse({'done': True, 'model': model_name})
             except Exception as e:
-                print(f"Error saving AI content: {e}")
+                print(f"AI generation error: {e}")
+                yield _sse({'error': f'Failed to generate content: {str(e)}'})
+            finally:
+                if chunks:
+                    _record_generation(prompt, ''.join(chunks), model_name)
 
-        # Log activity
-        log_activity(request.admin_id, 'ai_generate', {
-            'prompt_length': len(prompt),
-            'response_length': len(generated_content),
-            'model': model_name
-        })
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+
+    try:
+        generated_content = ''.join(_generate_chunks(prompt, model_name, max_tokens))
+
+        _record_generation(prompt, generated_content, model_name)
 
         return jsonify({
             'success': True,
@@ -316,31 +628,95 @@ def generate_content():
         return jsonify({'error': f'Failed to generate content: {str(e)}'}), 500
 
 
+# Largest page the history and activity endpoints return
+MAX_PAGE_SIZE = 100
+
+
+def _page_limit(default: int) -> int:
+    """Read ?limit=, clamped to 1..MAX_PAGE_SIZE"""
+    return min(max(request.args.get('limit', default, type=int), 1), MAX_PAGE_SIZE)
+
+
+def _fetch_page(query, before: str, limit: int):
+    """
+    Fetch one page, newest first, after a "<created_at>|<id>" cursor
+    Rows inserted together share created_at, so id breaks ties. Returns the
+    rows and the next cursor; raises ValueError for a malformed cursor.
+    """
+    # postgrest-py 0.13 has no or_() and would send two separate order params
+    if before:
+        created_at, _, row_id = before.rpartition('|')
+        created_at = datetime.fromisoformat(created_at).isoformat()
+        row_id = uuid.UUID(row_id)
+        query.params = query.params.add(
+            'or', f'(created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id}))'
+        )
+    query.params = query.params.add('order', 'created_at.desc,id.desc')
+
+    rows = query.limit(limit).execute().data
+    next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}" if len(rows) == limit else None
+    return rows, next_cursor
+
+
 @admin_bp.route('/ai/history', methods=['GET'])
 @require_admin_auth
 def get_ai_history():
-    """Get AI generation history"""
+    """Get AI generation history
+
+    Returns a short preview of each generation. Pass the returned
+    next_cursor as ?before= to fetch the next page.
+    """
+    supabase = get_supabase()
     if not supabase:
         return jsonify({'error': 'Database not configured'}), 500
 
     try:
-        limit = request.args.get('limit', 20, type=int)
+        query = supabase.table('ai_history_preview')\
+            .select('id,prompt,preview,model,created_at')\
+            .eq('admin_id', request.admin_id)
 
+        try:
+            history, next_cursor = _fetch_page(query, request.args.get('before'), _page_limit(20))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        return jsonify({
+            'success': True,
+            'history': history,
+            'next_cursor': next_cursor
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching history: {e}")
+        return jsonify({'error': 'Failed to fetch history'}), 500
+
+
+@admin_bp.route('/ai/history/<content_id>', methods=['GET'])
+@require_admin_auth
+def get_ai_history_item(content_id):
+    """Get a single AI generation including the full content"""
+    supabase = get_supabase()
+    if not supabase:
+        return jsonify({'error': 'Database not configured'}), 500
+
+    try:
         response = supabase.table('ai_generated_content')\
-            .select('*')\
+            .select('id,prompt,generated_content,model,created_at')\
+            .eq('id', content_id)\
             .eq('admin_id', request.admin_id)\
-            .order('created_at', desc=True)\
-            .limit(limit)\
             .execute()
 
+        if not response.data:
+            return jsonify({'error': 'Content not found'}), 404
+
         return jsonify({
             'success': True,
-            'history': response.data
+            'item': response.data[0]
         }), 200
 
     except Exception as e:
-        print(f"Error fetching history: {e}")
-        return jsonify({'error': 'Failed to fetch history'}), 500
+        print(f"Error fetching history item: {e}")
+        return jsonify({'error': 'Failed to fetch history item'}), 500
 
 
 # =============================================================================
@@ -350,28 +726,40 @@ def get_ai_history():
 @admin_bp.route('/activity', methods=['GET'])
 @require_admin_auth
 def get_activity_log():
-    """Get admin activity log"""
+    """Get admin activity log
+
+    Pass the returned next_cursor as ?before= to fetch the next page.
+    """
+    supabase = get_supabase()
     if not supabase:
         return jsonify({'error': 'Database not configured'}), 500
 
     try:
-        limit = request.args.get('limit', 50, type=int)
+        query = supabase.table('admin_activity_log')\
+            .select('id,action,details,ip_address,created_at')\
+            .eq('admin_id', request.admin_id)
 
-        response = supabase.table('admin_activity_log')\
-            .select('*')\
-            .eq('admin_id', request.admin_id)\
-            .order('created_at', desc=True)\
-            .limit(limit)\
-            .execute()
+        try:
+            activities, next_cursor = _fetch_page(query, request.args.get('before'), _page_limit(50))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
 
         return jsonify({
             'success': True,
-            'activities': response.data
+            'activities': activities,
+            'next_cursor': next_cursor
         }), 200
 
     except Exception as e:
         return jsonify({'error': 'Failed to fetch activity log'}), 500
 
 
-# Initialize admin user on module load
-init_admin_user()
+@admin_bp.record_once
+def bootstrap_admin_user(state):
+    """Initialize admin user once when the blueprint is registered.
+
+    Skipped on Vercel production so cold starts make no database calls;
+    run init_admin.py once after deploying instead.
+    """
+    if os.getenv('VERCEL_ENV') != 'production':
+        init_admin_user()
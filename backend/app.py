@@ -3,14 +3,19 @@ Flask API for Countdown Timer with User Authentication
 """
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from flask_compress import Compress
 from flask_jwt_extended import (
     JWTManager, create_access_token, jwt_required,
     get_jwt_identity, get_jwt
 )
 from datetime import timedelta
 import os
+import threading
+import time
+from cachetools import TLRUCache
 from dotenv import load_dotenv
 
+from json_provider import OrjsonProvider
 from models import Database, User, UserPreferences, UserPresets, MemberPortfolio
 from stripe_routes import stripe_bp
 from supabase_auth import supabase_auth_bp
@@ -21,6 +26,7 @@ load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-me')
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-me')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
@@ -28,6 +34,15 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 # Enable CORS
 CORS(app)
 
+# Compress JSON responses (Brotli, falling back to gzip)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 500
+# The API only serves JSON (SSE streams must stay uncompressed and unbuffered)
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+Compress(app)
+
 # Initialize JWT
 jwt = JWTManager(app)
 
@@ -44,21 +59,69 @@ app.register_blueprint(stripe_bp, url_prefix='/api/stripe')
 app.register_blueprint(supabase_auth_bp, url_prefix='/api/auth')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
-# Token blacklist for logout functionality
-token_blacklist = set()
+# Token blacklist for logout functionality.
+# Entries map jti -> token expiry and are evicted once the token expires.
+token_blacklist = TLRUCache(maxsize=10000, ttu=lambda jti, exp, now: exp, timer=time.time)
+token_blacklist_lock = threading.Lock()
+
+# Optional Redis store so revocations survive restarts and are shared
+# between instances
+redis_client = None
+if os.getenv('REDIS_URL'):
+    try:
+        import redis
+        redis_client = redis.Redis.from_url(os.getenv('REDIS_URL'), max_connections=10)
+    except Exception as e:
+        print(f"Failed to initialize Redis: {e}")
 
 
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload):
     """Check if token is revoked"""
     jti = jwt_payload['jti']
-    return jti in token_blacklist
+    with token_blacklist_lock:
+        if jti in token_blacklist:
+            return True
+
+    if redis_client:
+        try:
+            return redis_client.exists(f'revoked:{jti}') > 0
+        except Exception as e:
+            print(f"Redis revocation check failed: {e}")
+    return False
+
+
+def conditional_json(payload):
+    """JSON response with an ETag, answering 304 when the client's copy is current"""
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    etag, _ = response.get_etag()
+
+    # Compress appends the encoding to the ETag ("<tag>:gzip"), so compare the base tag
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if tag.split(':', 1)[0] == etag:
+            not_modified = app.response_class(status=304)
+            not_modified.set_etag(tag)
+            not_modified.headers['Cache-Control'] = response.headers['Cache-Control']
+            return not_modified
+
+    return response
 
 
 # =============================================================================
 # Authentication Endpoints
 # =============================================================================
 
+# Preferences every new user starts with
+DEFAULT_PREFERENCES = {
+    'voice_enabled': 'true',
+    'default_hours': '0',
+    'default_minutes': '1',
+    'default_seconds': '0'
+}
+
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -80,19 +143,16 @@ def register():
     if len(password) < 6:
         return jsonify({'error': 'Password must be at least 6 characters'}), 400
 
-    # Create user
-    user_id = user_model.create_user(username, email, password)
+    # Hash before the transaction so the write lock isn't held while hashing
+    password_hash = User.hash_password(password)
 
-    if user_id:
-        # Set default preferences
-        default_prefs = {
-            'voice_enabled': 'true',
-            'default_hours': '0',
-            'default_minutes': '1',
-            'default_seconds': '0'
-        }
-        preferences_model.set_multiple_preferences(user_id, default_prefs)
+    # Create the user and default preferences in one transaction
+    with db.transaction():
+        user_id = user_model.insert_user(username, email, password_hash)
+        if user_id:
+            preferences_model.set_multiple_preferences(user_id, DEFAULT_PREFERENCES)
 
+    if user_id:
         return jsonify({
             'message': 'User registered successfully',
             'user_id': user_id
@@ -136,8 +196,17 @@ def login():
 @jwt_required()
 def logout():
     """Logout user (blacklist token)"""
-    jti = get_jwt()['jti']
-    token_blacklist.add(jti)
+    token = get_jwt()
+    jti = token['jti']
+    with token_blacklist_lock:
+        token_blacklist[jti] = token['exp']
+
+    if redis_client:
+        try:
+            ttl = max(int(token['exp'] - time.time()), 1)
+            redis_client.set(f'revoked:{jti}', 1, ex=ttl)
+        except Exception as e:
+            print(f"Redis revocation failed: {e}")
 
     return jsonify({'message': 'Logout successful'}), 200
 
@@ -172,7 +241,7 @@ def get_preferences():
     user_id = get_jwt_identity()
     preferences = preferences_model.get_preferences(user_id)
 
-    return jsonify({'preferences': preferences}), 200
+    return conditional_json({'preferences': preferences})
 
 
 @app.route('/api/preferences', methods=['POST'])
@@ -225,6 +294,29 @@ def delete_preference(key):
 # User Presets Endpoints
 # =============================================================================
 
+# Upper bound for each preset time field
+PRESET_TIME_LIMITS = {'hours': 23, 'minutes': 59, 'seconds': 59}
+_MAX_HOURS, _MAX_MINUTES, _MAX_SECONDS = PRESET_TIME_LIMITS.values()
+
+
+def parse_preset_time(data):
+    """Parse and validate preset time fields, returning ((hours, minutes, seconds), error)"""
+    try:
+        hours, minutes, seconds = (int(data.get(field, 0)) for field in PRESET_TIME_LIMITS)
+    except (TypeError, ValueError):
+        return None, 'Hours, minutes and seconds must be whole numbers'
+
+    # A single combined range check covers the common (valid) case
+    if (hours | minutes | seconds) >= 0 and hours <= _MAX_HOURS and minutes <= _MAX_MINUTES and seconds <= _MAX_SECONDS:
+        return (hours, minutes, seconds), None
+
+    field, limit = next(
+        (field, limit) for (field, limit), value in zip(PRESET_TIME_LIMITS.items(), (hours, minutes, seconds))
+        if not 0 <= value <= limit
+    )
+    return None, f'{field.capitalize()} must be between 0 and {limit}'
+
+
 @app.route('/api/presets', methods=['GET'])
 @jwt_required()
 def get_presets():
@@ -232,7 +324,7 @@ def get_presets():
     user_id = get_jwt_identity()
     presets = presets_model.get_presets(user_id)
 
-    return jsonify({'presets': presets}), 200
+    return conditional_json({'presets': presets})
 
 
 @app.route('/api/presets', methods=['POST'])
@@ -247,17 +339,12 @@ def create_preset():
         return jsonify({'error': 'Preset name is required'}), 400
 
     name = data['name']
-    hours = int(data.get('hours', 0))
-    minutes = int(data.get('minutes', 0))
-    seconds = int(data.get('seconds', 0))
 
     # Validate time values
-    if hours < 0 or hours > 23:
-        return jsonify({'error': 'Hours must be between 0 and 23'}), 400
-    if minutes < 0 or minutes > 59:
-        return jsonify({'error': 'Minutes must be between 0 and 59'}), 400
-    if seconds < 0 or seconds > 59:
-        return jsonify({'error': 'Seconds must be between 0 and 59'}), 400
+    time_values, error = parse_preset_time(data)
+    if error:
+        return jsonify({'error': error}), 400
+    hours, minutes, seconds = time_values
 
     preset_id = presets_model.create_preset(user_id, name, hours, minutes, seconds)
 
@@ -278,9 +365,12 @@ def update_preset(preset_id):
         return jsonify({'error': 'Preset name is required'}), 400
 
     name = data['name']
-    hours = int(data.get('hours', 0))
-    minutes = int(data.get('minutes', 0))
-    seconds = int(data.get('seconds', 0))
+
+    # Validate time values
+    time_values, error = parse_preset_time(data)
+    if error:
+        return jsonify({'error': error}), 400
+    hours, minutes, seconds = time_values
 
     presets_model.update_preset(user_id, preset_id, name, hours, minutes, seconds)
 
@@ -403,10 +493,14 @@ def delete_portfolio():
 # Health Check
 # =============================================================================
 
+# Serialized once; monitors poll this endpoint constantly
+HEALTH_BODY = app.json.dumps({'status': 'healthy', 'message': 'Timer API is running'}).encode()
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'message': 'Timer API is running'}), 200
+    return app.response_class(HEALTH_BODY, mimetype='application/json')
 
 
 # =============================================================================
@@ -424,6 +518,7 @@ def internal_error(error):
 
 
 if __name__ == '__main__':
+    # Local development server; deployments run gunicorn (see gunicorn.conf.py)
     # Get port from environment (for Railway, Heroku, etc.)
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') != 'production'
@@ -0,0 +1,13 @@
+"""
+ASGI entry point for the Countdown Timer API
+Each request runs on a worker thread, so slow AI generations don't block
+other requests in the same process:
+    cd backend && uvicorn asgi:asgi_app
+Kept out of api/ because Vercel serves the WSGI app and deploys every
+module there as a function.
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app
+
+asgi_app = WsgiToAsgi(app)
@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the Countdown Timer API
+Used by the Procfile, Railway and Docker deployments (gunicorn app:app)
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Threaded workers overlap requests waiting on Supabase/Stripe. SQLite and
+# Argon2 release the GIL while they work, and the SQLite connection pool and
+# background queues rely on real threads rather than monkey-patched ones.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Scale with threads: logged-out tokens and cached preferences are kept per
+# process, so extra workers need REDIS_URL to share token revocations
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+if workers > 1 and not os.getenv('REDIS_URL'):
+    # Some platforms set WEB_CONCURRENCY themselves, so fall back rather than fail
+    print(f'WEB_CONCURRENCY={workers} requires REDIS_URL; starting 1 worker')
+    workers = 1
+
+timeout = 60
+keepalive = 5
@@ -5,7 +5,7 @@ Creates the first admin user in Supabase database
 """
 
 import os
-import hashlib
+from argon2 import PasswordHasher
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -13,9 +13,12 @@ from supabase import create_client, Client
 load_dotenv()
 
 
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+
 def hash_password(password: str) -> str:
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password using Argon2id"""
+    return password_hasher.hash(password)
 
 
 def init_admin_user():
@@ -36,40 +39,16 @@ def init_admin_user():
         supabase: Client = create_client(supabase_url, supabase_key)
         print("✓ Connected to Supabase")
 
-        # Check if admin already exists
-        response = supabase.table('admin_users').select('*').eq('email', admin_email).execute()
-
-        if response.data:
-            print(f"ℹ️  Admin user already exists: {admin_email}")
-
-            # Ask if user wants to update password
-            update = input("Do you want to update the password? (y/n): ")
-            if update.lower() == 'y':
-                new_password = input("Enter new password: ")
-                if len(new_password) < 6:
-                    print("❌ Password must be at least 6 characters")
-                    return False
-
-                password_hash = hash_password(new_password)
-                supabase.table('admin_users').update({
-                    'password_hash': password_hash
-                }).eq('email', admin_email).execute()
-
-                print(f"✓ Password updated for {admin_email}")
-                return True
-            else:
-                print("No changes made.")
-                return True
-
-        # Create new admin user
+        # Insert the admin unless one with this email already exists.
+        # Ignored duplicates come back empty, so one request covers both cases.
         password_hash = hash_password(admin_password)
 
-        result = supabase.table('admin_users').insert({
+        result = supabase.table('admin_users').upsert({
             'email': admin_email,
             'password_hash': password_hash,
             'full_name': 'System Administrator',
             'is_active': True
-        }).execute()
+        }, on_conflict='email', ignore_duplicates=True).execute()
 
         if result.data:
             print("✓ Admin user created successfully!")
@@ -78,9 +57,27 @@ def init_admin_user():
             print(f"   Password: {admin_password}")
             print(f"\n⚠️  IMPORTANT: Change these credentials in production!")
             return True
+
+        print(f"ℹ️  Admin user already exists: {admin_email}")
+
+        # Ask if user wants to update password
+        update = input("Do you want to update the password? (y/n): ")
+        if update.lower() == 'y':
+            new_password = input("Enter new password: ")
+            if len(new_password) < 6:
+                print("❌ Password must be at least 6 characters")
+                return False
+
+            password_hash = hash_password(new_password)
+            supabase.table('admin_users').update({
+                'password_hash': password_hash
+            }, returning='minimal').eq('email', admin_email).execute()
+
+            print(f"✓ Password updated for {admin_email}")
+            return True
         else:
-            print("❌ Failed to create admin user")
-            return False
+            print("No changes made.")
+            return True
 
     except Exception as e:
         print(f"❌ Error: {e}")
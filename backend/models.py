@@ -1,30 +1,148 @@
 """
 Database models for Countdown Timer API
 """
+import os
+import queue
 import sqlite3
 import hashlib
+import hmac
 import json
+import threading
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from cachetools import TTLCache
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional, Dict, List
 
 
+# Hot-path statements. Reusing the exact same SQL text on pooled
+# connections lets sqlite3's statement cache skip re-parsing them.
+SQL_GET_USER_BY_USERNAME = 'SELECT id, username, email, password_hash FROM users WHERE username = ?'
+SQL_GET_USER_BY_ID = 'SELECT id, username, email, created_at, last_login FROM users WHERE id = ?'
+SQL_UPDATE_LAST_LOGIN = 'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?'
+
+SQL_GET_PREFERENCES = 'SELECT preference_key, preference_value FROM user_preferences WHERE user_id = ?'
+SQL_UPSERT_PREFERENCE = '''
+    INSERT INTO user_preferences (user_id, preference_key, preference_value, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id, preference_key)
+    DO UPDATE SET preference_value = ?, updated_at = CURRENT_TIMESTAMP
+'''
+SQL_DELETE_PREFERENCE = 'DELETE FROM user_preferences WHERE user_id = ? AND preference_key = ?'
+
+SQL_INSERT_PRESET = '''
+    INSERT INTO user_presets (user_id, name, hours, minutes, seconds)
+    VALUES (?, ?, ?, ?, ?)
+'''
+SQL_GET_PRESETS = '''
+    SELECT id, name, hours, minutes, seconds, created_at
+    FROM user_presets WHERE user_id = ?
+    ORDER BY created_at DESC
+'''
+SQL_UPDATE_PRESET = '''
+    UPDATE user_presets
+    SET name = ?, hours = ?, minutes = ?, seconds = ?
+    WHERE id = ? AND user_id = ?
+'''
+SQL_DELETE_PRESET = 'DELETE FROM user_presets WHERE id = ? AND user_id = ?'
+
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+
 class Database:
     """Database manager for SQLite operations"""
 
-    def __init__(self, db_path='timer_app.db'):
+    def __init__(self, db_path='timer_app.db', pool_size=None):
         self.db_path = db_path
+        if db_path == ':memory:':
+            # Every connection to :memory: is a separate database, so share one
+            self.pool_size = 1
+        else:
+            self.pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', '5'))
+        # Connection held by the current thread's open transaction, if any
+        self._local = threading.local()
+
+        # Connections are opened once and reused across requests
+        self._pool = queue.Queue(maxsize=self.pool_size)
+        for _ in range(self.pool_size):
+            self._pool.put(self.get_connection())
         self.init_db()
 
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
+        """Open a new database connection"""
+        # Pooled connections live for the whole process, so give the
+        # per-connection statement cache room for every query the models run
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
         conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-64000')
+        conn.execute('PRAGMA temp_store=MEMORY')
         return conn
 
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            # Inside transaction(): keep using its connection
+            yield held
+            return
+
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            # Never hand a half-finished transaction to the next borrower
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Run every query in the block in one transaction, committed at the end"""
+        if self.in_transaction():
+            yield
+            return
+
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._local.conn = conn
+            try:
+                yield
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._local.conn = None
+
+    def in_transaction(self) -> bool:
+        """Whether the current thread is inside transaction()"""
+        return getattr(self._local, 'conn', None) is not None
+
+    def _commit(self, conn):
+        """Commit unless an enclosing transaction() will"""
+        if not self.in_transaction():
+            conn.commit()
+
+    def close_all(self):
+        """Close every pooled connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
     def init_db(self):
         """Initialize database tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            self._create_tables(conn.cursor())
+            conn.commit()
+
+    def _create_tables(self, cursor):
+        """Create any missing tables and indexes"""
 
         # Users table
         cursor.execute('''
@@ -65,6 +183,13 @@ class Database:
             )
         ''')
 
+        # Covering index so get_presets is answered from the index alone.
+        # user_preferences lookups already use its UNIQUE(user_id, preference_key) index.
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_presets_user_created
+            ON user_presets (user_id, created_at DESC, id, name, hours, minutes, seconds)
+        ''')
+
         # Member portfolios table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS member_portfolios (
@@ -78,13 +203,9 @@ class Database:
             )
         ''')
 
-        conn.commit()
-        conn.close()
-
     def execute_query(self, query, params=None):
         """Execute a query and return results"""
-        conn = self.get_connection()
-        try:
+        with self.connection() as conn:
             cursor = conn.cursor()
 
             if params:
@@ -92,23 +213,39 @@ class Database:
             else:
                 cursor.execute(query)
 
-            conn.commit()
+            self._commit(conn)
             results = cursor.fetchall()
             return results
-        finally:
-            conn.close()
+
+    def execute_write(self, query, params=None):
+        """Execute a write statement and return the number of affected rows"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+
+            self._commit(conn)
+            return cursor.rowcount
+
+    def execute_many(self, query, seq_of_params):
+        """Execute a query for each parameter set in a single transaction"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(query, seq_of_params)
+            self._commit(conn)
+            return cursor.rowcount
 
     def execute_insert(self, query, params):
         """Execute an insert query and return the inserted ID"""
-        conn = self.get_connection()
-        try:
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            conn.commit()
+            self._commit(conn)
             last_id = cursor.lastrowid
             return last_id
-        finally:
-            conn.close()
 
 
 class User:
@@ -119,13 +256,29 @@ class User:
 
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash a password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash a password using Argon2id"""
+        return password_hasher.hash(password)
+
+    @staticmethod
+    def check_password(password_hash: str, password: str) -> bool:
+        """Check a password against an Argon2 or legacy SHA-256 hash"""
+        if password_hash.startswith('$argon2'):
+            try:
+                return password_hasher.verify(password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+
+        # Legacy unsalted SHA-256 hashes created before the Argon2 migration
+        legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy_hash, password_hash)
 
     def create_user(self, username: str, email: str, password: str) -> Optional[int]:
         """Create a new user"""
+        return self.insert_user(username, email, self.hash_password(password))
+
+    def insert_user(self, username: str, email: str, password_hash: str) -> Optional[int]:
+        """Insert a user with an already hashed password"""
         try:
-            password_hash = self.hash_password(password)
             query = '''
                 INSERT INTO users (username, email, password_hash)
                 VALUES (?, ?, ?)
@@ -137,8 +290,7 @@ class User:
 
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username"""
-        query = 'SELECT * FROM users WHERE username = ?'
-        results = self.db.execute_query(query, (username,))
+        results = self.db.execute_query(SQL_GET_USER_BY_USERNAME, (username,))
 
         if results:
             row = results[0]
@@ -147,8 +299,7 @@ class User:
 
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by ID"""
-        query = 'SELECT * FROM users WHERE id = ?'
-        results = self.db.execute_query(query, (user_id,))
+        results = self.db.execute_query(SQL_GET_USER_BY_ID, (user_id,))
 
         if results:
             row = results[0]
@@ -159,54 +310,88 @@ class User:
         """Verify user password and return user data if valid"""
         user = self.get_user_by_username(username)
 
-        if user and user['password_hash'] == self.hash_password(password):
+        if user and self.check_password(user['password_hash'], password):
+            # Upgrade legacy or outdated hashes now that we know the password
+            if (not user['password_hash'].startswith('$argon2')
+                    or password_hasher.check_needs_rehash(user['password_hash'])):
+                self.update_password_hash(user['id'], self.hash_password(password))
+
             # Update last login
             self.update_last_login(user['id'])
             return user
         return None
 
+    def update_password_hash(self, user_id: int, password_hash: str):
+        """Replace a user's stored password hash"""
+        query = 'UPDATE users SET password_hash = ? WHERE id = ?'
+        self.db.execute_write(query, (password_hash, user_id))
+
     def update_last_login(self, user_id: int):
         """Update user's last login timestamp"""
-        query = 'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?'
-        self.db.execute_query(query, (user_id,))
+        self.db.execute_write(SQL_UPDATE_LAST_LOGIN, (user_id,))
 
 
 class UserPreferences:
     """User preferences model"""
 
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_ttl: int = None):
         self.db = db
+        # Per-process cache of user_id -> preferences, dropped on every write.
+        # Writes on another worker can't invalidate it, so it is only on by
+        # default for single-process deployments.
+        if cache_ttl is None:
+            single_process = int(os.getenv('WEB_CONCURRENCY', '1')) <= 1
+            cache_ttl = int(os.getenv('PREFERENCES_CACHE_TTL', '15' if single_process else '0'))
+        self._cache = TTLCache(maxsize=10000, ttl=cache_ttl) if cache_ttl > 0 else None
+        self._cache_lock = threading.Lock()
+        # Bumped on every write, so a read that raced a write doesn't cache stale
+        # rows. Entries only need to outlive an in-flight read, so they expire.
+        self._generations = TTLCache(maxsize=10000, ttl=60)
+
+    def _invalidate(self, user_id: int):
+        """Drop the cached preferences for a user"""
+        if self._cache is not None:
+            with self._cache_lock:
+                self._cache.pop(user_id, None)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
 
     def get_preferences(self, user_id: int) -> Dict[str, str]:
         """Get all preferences for a user"""
-        query = 'SELECT preference_key, preference_value FROM user_preferences WHERE user_id = ?'
-        results = self.db.execute_query(query, (user_id,))
+        if self._cache is not None:
+            with self._cache_lock:
+                cached = self._cache.get(user_id)
+                generation = self._generations.get(user_id, 0)
+            if cached is not None:
+                return dict(cached)
+
+        results = self.db.execute_query(SQL_GET_PREFERENCES, (user_id,))
 
         preferences = {}
         for row in results:
             preferences[row['preference_key']] = row['preference_value']
 
-        return preferences
+        if self._cache is not None and not self.db.in_transaction():
+            with self._cache_lock:
+                if self._generations.get(user_id, 0) == generation:
+                    self._cache[user_id] = preferences
+        return dict(preferences)
 
     def set_preference(self, user_id: int, key: str, value: str):
         """Set a preference for a user"""
-        query = '''
-            INSERT INTO user_preferences (user_id, preference_key, preference_value, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(user_id, preference_key)
-            DO UPDATE SET preference_value = ?, updated_at = CURRENT_TIMESTAMP
-        '''
-        self.db.execute_query(query, (user_id, key, value, value))
+        self.db.execute_write(SQL_UPSERT_PREFERENCE, (user_id, key, value, value))
+        self._invalidate(user_id)
 
     def delete_preference(self, user_id: int, key: str):
         """Delete a preference"""
-        query = 'DELETE FROM user_preferences WHERE user_id = ? AND preference_key = ?'
-        self.db.execute_query(query, (user_id, key))
+        self.db.execute_write(SQL_DELETE_PREFERENCE, (user_id, key))
+        self._invalidate(user_id)
 
     def set_multiple_preferences(self, user_id: int, preferences: Dict[str, str]):
         """Set multiple preferences at once"""
-        for key, value in preferences.items():
-            self.set_preference(user_id, key, value)
+        params = [(user_id, key, value, value) for key, value in preferences.items()]
+        if params:
+            self.db.execute_many(SQL_UPSERT_PREFERENCE, params)
+            self._invalidate(user_id)
 
 
 class UserPresets:
@@ -217,21 +402,18 @@ class UserPresets:
 
     def create_preset(self, user_id: int, name: str, hours: int, minutes: int, seconds: int) -> int:
         """Create a new timer preset"""
-        query = '''
-            INSERT INTO user_presets (user_id, name, hours, minutes, seconds)
-            VALUES (?, ?, ?, ?, ?)
-        '''
-        preset_id = self.db.execute_insert(query, (user_id, name, hours, minutes, seconds))
+        preset_id = self.db.execute_insert(SQL_INSERT_PRESET, (user_id, name, hours, minutes, seconds))
         return preset_id
 
+    def create_presets_bulk(self, user_id: int, presets: List[tuple]):
+        """Create several presets from (name, hours, minutes, seconds) tuples"""
+        params = [(user_id, name, hours, minutes, seconds) for name, hours, minutes, seconds in presets]
+        if params:
+            self.db.execute_many(SQL_INSERT_PRESET, params)
+
     def get_presets(self, user_id: int) -> List[Dict]:
         """Get all presets for a user"""
-        query = '''
-            SELECT id, name, hours, minutes, seconds, created_at
-            FROM user_presets WHERE user_id = ?
-            ORDER BY created_at DESC
-        '''
-        results = self.db.execute_query(query, (user_id,))
+        results = self.db.execute_query(SQL_GET_PRESETS, (user_id,))
 
         presets = []
         for row in results:
@@ -241,17 +423,11 @@ class UserPresets:
 
     def delete_preset(self, user_id: int, preset_id: int):
         """Delete a preset"""
-        query = 'DELETE FROM user_presets WHERE id = ? AND user_id = ?'
-        self.db.execute_query(query, (preset_id, user_id))
+        self.db.execute_write(SQL_DELETE_PRESET, (preset_id, user_id))
 
     def update_preset(self, user_id: int, preset_id: int, name: str, hours: int, minutes: int, seconds: int):
         """Update a preset"""
-        query = '''
-            UPDATE user_presets
-            SET name = ?, hours = ?, minutes = ?, seconds = ?
-            WHERE id = ? AND user_id = ?
-        '''
-        self.db.execute_query(query, (name, hours, minutes, seconds, preset_id, user_id))
+        self.db.execute_write(SQL_UPDATE_PRESET, (name, hours, minutes, seconds, preset_id, user_id))
 
 
 class MemberPortfolio:
@@ -283,7 +459,7 @@ class MemberPortfolio:
                 SET description = ?, photo_url = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE user_id = ?
             '''
-            self.db.execute_query(query, (description, photo_url, user_id))
+            self.db.execute_write(query, (description, photo_url, user_id))
         else:
             # Create new portfolio
             query = '''
@@ -304,7 +480,7 @@ class MemberPortfolio:
                 SET description = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE user_id = ?
             '''
-            self.db.execute_query(query, (description, user_id))
+            self.db.execute_write(query, (description, user_id))
         else:
             query = '''
                 INSERT INTO member_portfolios (user_id, description)
@@ -324,7 +500,7 @@ class MemberPortfolio:
                 SET photo_url = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE user_id = ?
             '''
-            self.db.execute_query(query, (photo_url, user_id))
+            self.db.execute_write(query, (photo_url, user_id))
         else:
             query = '''
                 INSERT INTO member_portfolios (user_id, photo_url)
@@ -337,4 +513,4 @@ class MemberPortfolio:
     def delete_portfolio(self, user_id: int):
         """Delete a user's portfolio"""
         query = 'DELETE FROM member_portfolios WHERE user_id = ?'
-        self.db.execute_query(query, (user_id,))
+        self.db.execute_write(query, (user_id,))
@@ -2,10 +2,19 @@
 Stripe Integration Routes for Payment Processing
 """
 import os
+import atexit
+import hashlib
+import hmac
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import stripe
 from flask import Blueprint, request, jsonify
 from dotenv import load_dotenv
 
+from supabase_client import get_supabase
+
 # Load environment variables
 load_dotenv()
 
@@ -17,10 +26,21 @@ stripe_bp = Blueprint('stripe', __name__)
 
 # Webhook secret for verifying Stripe events
 WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+_webhook_secret_bytes = WEBHOOK_SECRET.encode() if WEBHOOK_SECRET else None
 
 # Frontend URL for redirects
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5000')
 
+# Verified webhook events are acknowledged right away and applied to
+# Supabase by a single background worker, which keeps them in order.
+# The queue only works on long-lived servers: serverless instances (Vercel)
+# freeze once the response is sent and never run the atexit drain, and
+# Stripe won't retry an event it already got a 200 for. There, events are
+# applied before responding instead.
+WEBHOOK_INLINE = bool(os.getenv('VERCEL'))
+_webhook_queue = queue.Queue(maxsize=int(os.getenv('STRIPE_WEBHOOK_QUEUE_SIZE', 1000)))
+_webhook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stripe-webhook')
+
 
 @stripe_bp.route('/create-checkout-session', methods=['POST'])
 def create_checkout_session():
@@ -70,11 +90,9 @@ def create_portal_session():
 
         # Get customer ID from Supabase (you'll need to query this)
         # For now, we'll assume it's stored in the subscriptions table
-        from supabase import create_client
-
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_supabase()
+        if not supabase:
+            return jsonify({'error': 'Database not configured'}), 500
 
         # Get subscription record
         result = supabase.table('subscriptions').select('stripe_customer_id').eq('user_id', user_id).single().execute()
@@ -97,16 +115,48 @@ def create_portal_session():
         return jsonify({'error': str(e)}), 500
 
 
+def _verify_signature_fast(payload: str, sig_header: str) -> bool:
+    """Check the common single-signature Stripe-Signature header with one HMAC
+
+    Returns False for anything unusual (extra or rotated signatures, stale
+    timestamps, mismatches) so the caller falls back to the Stripe library.
+    """
+    if not _webhook_secret_bytes or not sig_header:
+        return False
+
+    timestamp, _, signature = sig_header.partition(',')
+    if not timestamp.startswith('t=') or not signature.startswith('v1=') or ',' in signature:
+        return False
+
+    timestamp = timestamp[2:]
+    if not timestamp.isdigit() or int(timestamp) < time.time() - stripe.Webhook.DEFAULT_TOLERANCE:
+        return False
+
+    expected = hmac.new(_webhook_secret_bytes, f'{timestamp}.{payload}'.encode(), hashlib.sha256).digest()
+    # Compare bytes: compare_digest raises TypeError for non-ASCII str
+    return hmac.compare_digest(expected.hex().encode(), signature[3:].encode('utf-8', 'surrogateescape'))
+
+
 @stripe_bp.route('/webhook', methods=['POST'])
 def stripe_webhook():
     """Handle Stripe webhook events"""
-    payload = request.data
+    payload = request.get_data(as_text=True)
     sig_header = request.headers.get('Stripe-Signature')
 
+    # Stripe's own check raises TypeError on non-ASCII signatures; real
+    # headers are always ASCII
+    if sig_header and not sig_header.isascii():
+        print('Invalid signature: non-ASCII Stripe-Signature header')
+        return jsonify({'error': 'Invalid signature'}), 400
+
+    # Verify the signature, then parse with orjson; the handlers only need
+    # plain dicts, so no StripeObject tree is built for the event
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, WEBHOOK_SECRET
-        )
+        if not _verify_signature_fast(payload, sig_header):
+            stripe.WebhookSignature.verify_header(
+                payload, sig_header, WEBHOOK_SECRET, stripe.Webhook.DEFAULT_TOLERANCE
+            )
+        event = orjson.loads(payload)
     except ValueError as e:
         # Invalid payload
         print(f'Invalid payload: {str(e)}')
@@ -116,33 +166,64 @@ def stripe_webhook():
         print(f'Invalid signature: {str(e)}')
         return jsonify({'error': 'Invalid signature'}), 400
 
-    # Handle the event
-    if event['type'] == 'checkout.session.completed':
-        handle_checkout_completed(event['data']['object'])
+    if WEBHOOK_INLINE:
+        dispatch_event(event['type'], event['data']['object'])
+        return jsonify({'success': True}), 200
 
-    elif event['type'] == 'customer.subscription.updated':
-        handle_subscription_updated(event['data']['object'])
+    # Queue the event; when the backlog is full let Stripe retry later
+    try:
+        _webhook_queue.put_nowait((event['type'], event['data']['object']))
+    except queue.Full:
+        print(f'Webhook queue full, deferring event {event["id"]}')
+        return jsonify({'error': 'Busy, retry later'}), 503
+
+    _webhook_executor.submit(process_webhook_events)
 
-    elif event['type'] == 'customer.subscription.deleted':
-        handle_subscription_deleted(event['data']['object'])
+    return jsonify({'success': True}), 200
 
-    elif event['type'] == 'invoice.payment_succeeded':
-        handle_payment_succeeded(event['data']['object'])
 
-    elif event['type'] == 'invoice.payment_failed':
-        handle_payment_failed(event['data']['object'])
+def dispatch_event(event_type, data):
+    """Run the handler for a webhook event type"""
+    if event_type == 'checkout.session.completed':
+        handle_checkout_completed(data)
 
-    return jsonify({'success': True}), 200
+    elif event_type == 'customer.subscription.updated':
+        handle_subscription_updated(data)
+
+    elif event_type == 'customer.subscription.deleted':
+        handle_subscription_deleted(data)
+
+    elif event_type == 'invoice.payment_succeeded':
+        handle_payment_succeeded(data)
+
+    elif event_type == 'invoice.payment_failed':
+        handle_payment_failed(data)
+
+
+def process_webhook_events():
+    """Apply queued webhook events in the order they arrived"""
+    while True:
+        try:
+            event_type, data = _webhook_queue.get_nowait()
+        except queue.Empty:
+            return
+        dispatch_event(event_type, data)
+
+
+@atexit.register
+def _drain_webhook_events():
+    """Apply any pending webhook events before the process exits"""
+    _webhook_executor.shutdown(wait=True)
+    process_webhook_events()
 
 
 def handle_checkout_completed(session):
     """Handle successful checkout"""
     try:
-        from supabase import create_client
-
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_supabase()
+        if not supabase:
+            print('Supabase not configured, skipping subscription update')
+            return
 
         user_id = session.get('metadata', {}).get('user_id') or session.get('client_reference_id')
         plan_id = session.get('metadata', {}).get('plan_id')
@@ -161,7 +242,7 @@ def handle_checkout_completed(session):
             'stripe_customer_id': customer_id,
             'stripe_subscription_id': subscription_id,
             'updated_at': 'now()'
-        }).execute()
+        }, on_conflict='user_id', returning='minimal').execute()
 
         print(f'Subscription created/updated for user {user_id}')
 
@@ -172,11 +253,10 @@ def handle_checkout_completed(session):
 def handle_subscription_updated(subscription):
     """Handle subscription update"""
     try:
-        from supabase import create_client
-
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_supabase()
+        if not supabase:
+            print('Supabase not configured, skipping subscription update')
+            return
 
         subscription_id = subscription['id']
         status = subscription['status']
@@ -188,7 +268,7 @@ def handle_subscription_updated(subscription):
         supabase.table('subscriptions').update({
             'status': our_status,
             'updated_at': 'now()'
-        }).eq('stripe_subscription_id', subscription_id).execute()
+        }, returning='minimal').eq('stripe_subscription_id', subscription_id).execute()
 
         print(f'Subscription {subscription_id} updated to {our_status}')
 
@@ -199,11 +279,10 @@ def handle_subscription_updated(subscription):
 def handle_subscription_deleted(subscription):
     """Handle subscription cancellation"""
     try:
-        from supabase import create_client
-
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_supabase()
+        if not supabase:
+            print('Supabase not configured, skipping subscription update')
+            return
 
         subscription_id = subscription['id']
 
@@ -213,7 +292,7 @@ def handle_subscription_deleted(subscription):
             'status': 'active',
             'stripe_subscription_id': None,
             'updated_at': 'now()'
-        }).eq('stripe_subscription_id', subscription_id).execute()
+        }, returning='minimal').eq('stripe_subscription_id', subscription_id).execute()
 
         print(f'Subscription {subscription_id} cancelled, downgraded to free')
 
@@ -236,11 +315,10 @@ def handle_payment_failed(invoice):
         print(f'Payment failed for invoice {invoice["id"]}')
         # Add any additional logic here (e.g., send payment failed email)
 
-        from supabase import create_client
-
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_supabase()
+        if not supabase:
+            print('Supabase not configured, skipping subscription update')
+            return
 
         subscription_id = invoice.get('subscription')
 
@@ -248,7 +326,7 @@ def handle_payment_failed(invoice):
         supabase.table('subscriptions').update({
             'status': 'past_due',
             'updated_at': 'now()'
-        }).eq('stripe_subscription_id', subscription_id).execute()
+        }, returning='minimal').eq('stripe_subscription_id', subscription_id).execute()
 
     except Exception as e:
         print(f'Error handling payment failed: {str(e)}')
@@ -3,26 +3,174 @@ Supabase Authentication Routes with Enhanced Security
 Provides server-side session validation
 """
 import os
-from flask import Blueprint, request, jsonify
-from supabase import create_client, Client
+import hashlib
+import threading
+import orjson
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Optional, Dict, List, Set
+import jwt
+from jwt import PyJWKClient
+from jwt.exceptions import PyJWKClientConnectionError
+from cachetools import TTLCache
+from flask import Blueprint, Response, request
 from dotenv import load_dotenv
 
+from supabase_client import get_anon_supabase, get_supabase
+
 # Load environment variables
 load_dotenv()
 
 # Create Blueprint
 supabase_auth_bp = Blueprint('supabase_auth', __name__)
 
-# Initialize Supabase client (server-side with service role key for validation)
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
 
-supabase_client: Client = None
-if SUPABASE_URL and SUPABASE_SERVICE_KEY:
+def ojsonify(obj, status=200) -> Response:
+    """Build a JSON response with orjson, skipping Flask's JSON provider"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
+def get_supabase_client():
+    """
+    Get the shared client used for session checks
+    Session checks only need the anon key; the service-role client is the
+    fallback for deployments that have not configured SUPABASE_ANON_KEY
+    """
+    return get_anon_supabase() or get_supabase()
+
+
+# Verified session profiles keyed by a SHA256 of the bearer token, so a client
+# calling several endpoints in a row only costs one Supabase auth round trip
+_session_cache = TTLCache(maxsize=10000, ttl=30)
+_session_cache_lock = threading.Lock()
+
+# Supabase lookups in progress by cache key; concurrent requests with the
+# same token wait on the first lookup instead of issuing their own
+_session_lookups: Dict[str, Future] = {}
+
+# Most usernames accepted by one availability check
+MAX_USERNAME_BATCH = 100
+
+# PostgREST/Postgres error codes for a table that doesn't exist
+MISSING_TABLE_CODES = ('42P01', 'PGRST205')
+
+# Set when the profiles table (SUPABASE_SETUP.md) is missing, so later checks
+# skip the query; restart after creating the table
+_profiles_table_missing = False
+
+# Health check bodies, serialized once for each Supabase state so a later
+# successful client init is still reported
+_HEALTH_BODIES = {
+    configured: orjson.dumps({'status': 'healthy', 'supabase_configured': configured})
+    for configured in (True, False)
+}
+
+
+@lru_cache(maxsize=1)
+def get_jwks_client() -> Optional[PyJWKClient]:
+    """Get the client for the project's signing keys, which caches fetched keys"""
+    supabase_url = os.getenv('SUPABASE_URL', '')
+    if not supabase_url:
+        return None
+    return PyJWKClient(
+        f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+        cache_keys=True,
+        lifespan=3600,
+        timeout=5
+    )
+
+
+def decode_access_token(token: str) -> Optional[Dict]:
+    """
+    Verify a Supabase access token locally and return its claims
+    Returns None when the token can only be checked remotely; raises
+    jwt.InvalidTokenError when the token is invalid
+    """
+    if jwt.get_unverified_header(token).get('alg') == 'HS256':
+        # Legacy projects sign with a shared secret instead of published keys
+        jwt_secret = os.getenv('SUPABASE_JWT_SECRET', '')
+        if not jwt_secret:
+            return None
+        return jwt.decode(token, jwt_secret, algorithms=['HS256'], audience='authenticated')
+
+    jwks_client = get_jwks_client()
+    if not jwks_client:
+        return None
+    try:
+        signing_key = jwks_client.get_signing_key_from_jwt(token)
+    except PyJWKClientConnectionError as e:
+        print(f'JWKS fetch failed, verifying session remotely: {e}')
+        return None
+    return jwt.decode(token, signing_key.key, algorithms=['RS256', 'ES256'], audience='authenticated')
+
+
+def get_session_user(token: str) -> Optional[Dict]:
+    """Get the user profile for a session token, or None if the token is invalid"""
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    with _session_cache_lock:
+        cached = _session_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        lookup = _session_lookups.get(cache_key)
+        owner = lookup is None
+        if owner:
+            lookup = _session_lookups[cache_key] = Future()
+
+    if not owner:
+        return lookup.result()
+
     try:
-        supabase_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        profile = _fetch_session_user(token)
+        if profile is not None:
+            with _session_cache_lock:
+                _session_cache[cache_key] = profile
+        lookup.set_result(profile)
+        return profile
     except Exception as e:
-        print(f'Warning: Failed to initialize Supabase client: {e}')
+        lookup.set_exception(e)
+        raise
+    finally:
+        with _session_cache_lock:
+            _session_lookups.pop(cache_key, None)
+
+
+def _fetch_session_user(token: str) -> Optional[Dict]:
+    """Look up the user for a session token with Supabase's auth API"""
+    user = getattr(get_supabase_client().auth.get_user(token), 'user', None)
+    if not user:
+        return None
+
+    metadata = user.user_metadata
+    return {
+        'id': user.id,
+        'email': user.email,
+        'username': metadata.get('username'),
+        'display_name': metadata.get('display_name'),
+        'created_at': user.created_at,
+        'email_confirmed': user.email_confirmed_at is not None
+    }
+
+
+def find_taken_usernames(supabase, usernames: List[str]) -> Set[str]:
+    """Return which of the usernames are already taken, using a single query"""
+    global _profiles_table_missing
+    if _profiles_table_missing:
+        return set()
+
+    try:
+        # Usernames live in a 'profiles' table; auth.users metadata can't be queried
+        result = supabase.table('profiles').select('username').in_('username', usernames).execute()
+    except Exception as e:
+        # Matched by code so postgrest isn't imported at startup
+        if getattr(e, 'code', None) in MISSING_TABLE_CODES:
+            # Without a profiles table every username is treated as available
+            print('No profiles table, skipping username lookups (see SUPABASE_SETUP.md)')
+            _profiles_table_missing = True
+        else:
+            print(f'Username lookup failed: {e}')
+        return set()
+    return {row['username'] for row in result.data}
 
 
 @supabase_auth_bp.route('/verify-session', methods=['POST'])
@@ -32,25 +180,28 @@ def verify_session():
     This provides an additional layer of security beyond client-side validation
     """
     try:
-        # Get authorization header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'valid': False, 'error': 'No authorization token provided'}), 401
-
-        token = auth_header.replace('Bearer ', '')
+        # Get the token from an "Authorization: Bearer <token>" header
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        token = token.strip()
+        if scheme != 'Bearer' or not token:
+            return ojsonify({'valid': False, 'error': 'No authorization token provided'}, 401)
 
         # If Supabase client is not initialized, return valid in dev mode
-        if not supabase_client:
+        if not get_supabase_client():
             print('Warning: Supabase client not initialized, allowing session in dev mode')
-            return jsonify({'valid': True, 'dev_mode': True}), 200
+            return ojsonify({'valid': True, 'dev_mode': True}, 200)
 
-        # Verify the token with Supabase
+        # Verify the token locally, asking Supabase only if that isn't possible
         try:
-            user = supabase_client.auth.get_user(token)
+            claims = decode_access_token(token)
+            if claims is not None:
+                user = {'id': claims['sub'], 'email': claims.get('email')}
+            else:
+                user = get_session_user(token)
 
-            if user and hasattr(user, 'user') and user.user:
+            if user:
                 # Additional validation: check if user exists in database
-                user_id = user.user.id
+                user_id = user['id']
 
                 # You can add additional checks here, such as:
                 # - Check if user is active
@@ -58,50 +209,62 @@ def verify_session():
                 # - Check if session is not blacklisted
                 # - Rate limiting
 
-                return jsonify({
+                return ojsonify({
                     'valid': True,
                     'user_id': user_id,
-                    'email': user.user.email
-                }), 200
+                    'email': user['email']
+                }, 200)
             else:
-                return jsonify({'valid': False, 'error': 'Invalid token'}), 401
+                return ojsonify({'valid': False, 'error': 'Invalid token'}, 401)
 
         except Exception as e:
             print(f'Token verification error: {str(e)}')
-            return jsonify({'valid': False, 'error': 'Token verification failed'}), 401
+            return ojsonify({'valid': False, 'error': 'Token verification failed'}, 401)
 
     except Exception as e:
         print(f'Session verification error: {str(e)}')
-        return jsonify({'valid': False, 'error': 'Internal server error'}), 500
+        return ojsonify({'valid': False, 'error': 'Internal server error'}, 500)
 
 
 @supabase_auth_bp.route('/check-username', methods=['POST'])
 def check_username():
     """
     Check if a username is available
-    This helps prevent duplicate usernames
+    Accepts {"username": "..."} or {"usernames": [...]} to check many in one query
     """
     try:
-        data = request.get_json()
-        username = data.get('username', '').strip()
+        data = request.get_json() or {}
+        single = 'usernames' not in data
+        usernames = [data.get('username', '')] if single else data['usernames']
 
-        if not username:
-            return jsonify({'error': 'Username is required'}), 400
+        if not isinstance(usernames, list) or len(usernames) > MAX_USERNAME_BATCH:
+            return ojsonify({'error': f'usernames must be a list of at most {MAX_USERNAME_BATCH}'}, 400)
 
-        if not supabase_client:
-            # In dev mode without Supabase, assume username is available
-            return jsonify({'available': True, 'dev_mode': True}), 200
+        if not all(isinstance(username, str) for username in usernames):
+            return ojsonify({'error': 'Usernames must be strings'}, 400)
 
-        # Query auth.users table to check if username exists in user_metadata
-        # Note: This requires enabling the Supabase auth schema access or using a custom users table
+        usernames = [username.strip() for username in usernames]
+        if not usernames or not all(usernames):
+            return ojsonify({'error': 'Username is required'}, 400)
 
-        # For now, we'll return available since we can't easily query auth.users metadata
-        # In production, you should create a separate 'usernames' table or 'profiles' table
-        return jsonify({'available': True}), 200
+        # Profiles are read with the service role; the anon key can't see them
+        supabase = get_supabase()
+        if not supabase:
+            # In dev mode without Supabase, assume usernames are available
+            if single:
+                return ojsonify({'available': True, 'dev_mode': True}, 200)
+            return ojsonify({'results': dict.fromkeys(usernames, True), 'dev_mode': True}, 200)
+
+        taken = find_taken_usernames(supabase, usernames)
+        results = {username: username not in taken for username in usernames}
+
+        if single:
+            return ojsonify({'available': results[usernames[0]]}, 200)
+        return ojsonify({'results': results}, 200)
 
     except Exception as e:
         print(f'Username check error: {str(e)}')
-        return jsonify({'error': 'Internal server error'}), 500
+        return ojsonify({'error': 'Internal server error'}, 500)
 
 
 @supabase_auth_bp.route('/user-profile', methods=['GET'])
@@ -111,42 +274,30 @@ def get_user_profile():
     Requires valid session token
     """
     try:
-        # Get authorization header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'No authorization token provided'}), 401
-
-        token = auth_header.replace('Bearer ', '')
+        # Get the token from an "Authorization: Bearer <token>" header
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        token = token.strip()
+        if scheme != 'Bearer' or not token:
+            return ojsonify({'error': 'No authorization token provided'}, 401)
 
-        if not supabase_client:
-            return jsonify({'error': 'Service not available'}), 503
+        if not get_supabase_client():
+            return ojsonify({'error': 'Service not available'}, 503)
 
         # Get user from token
-        user = supabase_client.auth.get_user(token)
-
-        if user and hasattr(user, 'user') and user.user:
-            user_data = {
-                'id': user.user.id,
-                'email': user.user.email,
-                'username': user.user.user_metadata.get('username'),
-                'display_name': user.user.user_metadata.get('display_name'),
-                'created_at': user.user.created_at,
-                'email_confirmed': user.user.email_confirmed_at is not None
-            }
-            return jsonify(user_data), 200
+        user_data = get_session_user(token)
+
+        if user_data:
+            return ojsonify(user_data, 200)
         else:
-            return jsonify({'error': 'Invalid token'}), 401
+            return ojsonify({'error': 'Invalid token'}, 401)
 
     except Exception as e:
         print(f'Get user profile error: {str(e)}')
-        return jsonify({'error': 'Internal server error'}), 500
+        return ojsonify({'error': 'Internal server error'}, 500)
 
 
 @supabase_auth_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check for Supabase auth service"""
-    status = {
-        'status': 'healthy',
-        'supabase_configured': supabase_client is not None
-    }
-    return jsonify(status), 200
+    body = _HEALTH_BODIES[get_supabase_client() is not None]
+    return Response(body, mimetype='application/json')
@@ -0,0 +1,100 @@
+"""
+Shared Supabase client for the API blueprints
+Keeps one client and one pooled HTTP connection per process
+"""
+import os
+import threading
+from typing import Dict, Optional, TYPE_CHECKING
+
+# The Supabase SDK is slow to import, so it is imported on first use
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Each instance keeps a small pool of HTTP connections to Supabase, so
+# many concurrent serverless instances stay within the project's limits
+SUPABASE_MAX_CONNECTIONS = int(os.getenv('SUPABASE_MAX_CONNECTIONS', 5))
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 5))
+
+# Clients by the env var holding their API key. Only successfully created
+# clients are kept, so a failed initialization is retried on the next call.
+_clients: Dict[str, 'Client'] = {}
+_clients_lock = threading.Lock()
+
+
+def _use_pooled_session(client: 'Client'):
+    """Replace the PostgREST session with a bounded keep-alive HTTP/2 connection pool"""
+    import httpx
+    from postgrest.utils import SyncClient
+
+    postgrest = client.postgrest
+    session = postgrest.session
+    postgrest.session = SyncClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout,
+        http2=True,
+        limits=httpx.Limits(
+            max_keepalive_connections=SUPABASE_MAX_CONNECTIONS,
+            max_connections=SUPABASE_MAX_CONNECTIONS
+        )
+    )
+    session.close()
+
+
+def _create_client(supabase_key: str) -> 'Client':
+    """Create a Supabase client for the configured project with a pooled session"""
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+    options = ClientOptions(
+        schema='public',
+        postgrest_client_timeout=SUPABASE_TIMEOUT,
+        auto_refresh_token=False,
+        persist_session=False
+    )
+    client = create_client(os.getenv('SUPABASE_URL'), supabase_key, options=options)
+    _use_pooled_session(client)
+    return client
+
+
+def _get_client(key_name: str) -> Optional['Client']:
+    """Get the shared client for the API key in key_name, creating it once"""
+    client = _clients.get(key_name)
+    if client is not None:
+        return client
+
+    supabase_url = os.getenv('SUPABASE_URL', '')
+    supabase_key = os.getenv(key_name, '')
+    if not supabase_url or not supabase_key:
+        return None
+
+    with _clients_lock:
+        client = _clients.get(key_name)
+        if client is None:
+            client = _clients[key_name] = _create_client(supabase_key)
+    return client
+
+
+def get_supabase() -> Optional['Client']:
+    """Get the shared service-role Supabase client, initializing it on first use
+
+    Bypasses row level security; only for trusted server-side writes such as
+    the admin panel and Stripe webhooks.
+    """
+    try:
+        return _get_client('SUPABASE_SERVICE_KEY')
+    except Exception as e:
+        print(f"Failed to initialize Supabase: {e}")
+        return None
+
+
+def get_anon_supabase() -> Optional['Client']:
+    """Get the shared anon-key Supabase client, initializing it on first use
+
+    Respects row level security; used for verifying user sessions and any
+    query made on behalf of an end user.
+    """
+    try:
+        return _get_client('SUPABASE_ANON_KEY')
+    except Exception as e:
+        print(f"Failed to initialize Supabase anon client: {e}")
+        return None
@@ -3,45 +3,58 @@ Backend API Tests for Countdown Timer
 Tests authentication, preferences, and presets endpoints
 """
 import pytest
+import hashlib
+import hmac
 import json
 import os
 import sys
+import threading
+import time
+import uuid
+import httpx
+import jwt
+
+# Keep the test database in memory; must be set before app is imported
+os.environ['DATABASE_PATH'] = ':memory:'
+
+import admin_routes
+import stripe_routes
+import supabase_auth
+import supabase_client
+from types import SimpleNamespace
 from app import app, db, user_model, preferences_model, presets_model
+from models import password_hasher
+from postgrest.exceptions import APIError
 
+TEST_PASSWORD = 'testpass123'
+# Hashed once per run so seeding users skips the argon2 cost
+_PRECOMPUTED_HASH = password_hasher.hash(TEST_PASSWORD)
 
-@pytest.fixture
+
+def seed_user(username, email):
+    """Insert a user with TEST_PASSWORD directly, bypassing the register route"""
+    return user_model.insert_user(username, email, _PRECOMPUTED_HASH)
+
+
+@pytest.fixture(scope='module')
 def client():
     """Create test client"""
     app.config['TESTING'] = True
     app.config['JWT_SECRET_KEY'] = 'test-secret-key'
 
-    # Use test database
-    test_db_path = 'test_timer_app.db'
-    if os.path.exists(test_db_path):
-        os.remove(test_db_path)
-
     with app.test_client() as client:
         yield client
 
-    # Cleanup
-    if os.path.exists(test_db_path):
-        os.remove(test_db_path)
-
 
-@pytest.fixture
+@pytest.fixture(scope='module')
 def auth_headers(client):
-    """Create authenticated user and return auth headers"""
-    # Register user
-    client.post('/api/auth/register', json={
-        'username': 'testuser',
-        'email': 'test@example.com',
-        'password': 'testpass123'
-    })
+    """Create one authenticated user for the module and return auth headers"""
+    seed_user('testuser', 'test@example.com')
 
     # Login
     response = client.post('/api/auth/login', json={
         'username': 'testuser',
-        'password': 'testpass123'
+        'password': TEST_PASSWORD
     })
 
     token = response.get_json()['access_token']
@@ -49,6 +62,23 @@ def auth_headers(client):
     return {'Authorization': f'Bearer {token}'}
 
 
+@pytest.fixture
+def user_id(auth_headers):
+    """Return the ID of the authenticated test user"""
+    return user_model.get_user_by_username('testuser')['id']
+
+
+@pytest.fixture(autouse=True)
+def clean_user_data():
+    """Clear preferences and presets between tests, keeping the users"""
+    with db.transaction():
+        db.execute_write('DELETE FROM user_preferences')
+        db.execute_write('DELETE FROM user_presets')
+    if preferences_model._cache is not None:
+        with preferences_model._cache_lock:
+            preferences_model._cache.clear()
+
+
 class TestHealthCheck:
     """Test health check endpoint"""
 
@@ -60,6 +90,21 @@ class TestHealthCheck:
         data = response.get_json()
         assert data['status'] == 'healthy'
 
+    def test_supabase_health_tracks_client(self, client, monkeypatch):
+        """Should report whether the Supabase client is configured"""
+        monkeypatch.setattr(supabase_auth, 'get_supabase_client', lambda: None)
+        assert client.get('/api/auth/health').get_json()['supabase_configured'] is False
+
+        monkeypatch.setattr(supabase_auth, 'get_supabase_client', lambda: object())
+        response = client.get('/api/auth/health')
+        assert response.get_json() == {'status': 'healthy', 'supabase_configured': True}
+
+    def test_response_is_compact(self, client):
+        """Should return JSON without pretty-printing whitespace"""
+        response = client.get('/api/health')
+        assert b'\n' not in response.data
+        assert b'": ' not in response.data
+
 
 class TestAuthentication:
     """Test authentication endpoints"""
@@ -114,13 +159,13 @@ class TestAuthentication:
     def test_register_duplicate_username(self, client):
         """Should fail with duplicate username"""
         client.post('/api/auth/register', json={
-            'username': 'testuser',
+            'username': 'testuser2',
             'email': 'test1@example.com',
             'password': 'password123'
         })
 
         response = client.post('/api/auth/register', json={
-            'username': 'testuser',
+            'username': 'testuser2',
             'email': 'test2@example.com',
             'password': 'password123'
         })
@@ -178,6 +223,13 @@ class TestAuthentication:
 
     def test_logout(self, client, auth_headers):
         """Should logout successfully"""
+        # Use a fresh token so the shared auth_headers stay valid
+        response = client.post('/api/auth/login', json={
+            'username': 'testuser',
+            'password': TEST_PASSWORD
+        })
+        auth_headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
         response = client.post('/api/auth/logout', headers=auth_headers)
 
         assert response.status_code == 200
@@ -192,8 +244,20 @@ class TestAuthentication:
 class TestPreferences:
     """Test user preferences endpoints"""
 
-    def test_get_default_preferences(self, client, auth_headers):
+    def test_get_default_preferences(self, client):
         """Should get default preferences after registration"""
+        # The shared user's defaults are cleared between tests, so register a new one
+        client.post('/api/auth/register', json={
+            'username': 'prefsuser',
+            'email': 'prefs@example.com',
+            'password': TEST_PASSWORD
+        })
+        response = client.post('/api/auth/login', json={
+            'username': 'prefsuser',
+            'password': TEST_PASSWORD
+        })
+        auth_headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
         response = client.get('/api/preferences', headers=auth_headers)
 
         assert response.status_code == 200
@@ -203,7 +267,7 @@ class TestPreferences:
         assert data['preferences']['default_hours'] == '0'
         assert data['preferences']['default_minutes'] == '1'
 
-    def test_set_preferences(self, client, auth_headers):
+    def test_set_preferences(self, client, auth_headers, user_id):
         """Should set multiple preferences"""
         response = client.post('/api/preferences', headers=auth_headers, json={
             'preferences': {
@@ -217,16 +281,14 @@ class TestPreferences:
         assert response.status_code == 200
 
         # Verify preferences were set
-        response = client.get('/api/preferences', headers=auth_headers)
-        data = response.get_json()
-        prefs = data['preferences']
+        prefs = preferences_model.get_preferences(user_id)
 
         assert prefs['voice_enabled'] == 'false'
         assert prefs['default_hours'] == '1'
         assert prefs['default_minutes'] == '30'
         assert prefs['custom_setting'] == 'test_value'
 
-    def test_set_single_preference(self, client, auth_headers):
+    def test_set_single_preference(self, client, auth_headers, user_id):
         """Should set a single preference"""
         response = client.put('/api/preferences/voice_enabled',
                              headers=auth_headers,
@@ -235,11 +297,9 @@ class TestPreferences:
         assert response.status_code == 200
 
         # Verify preference was set
-        response = client.get('/api/preferences', headers=auth_headers)
-        data = response.get_json()
-        assert data['preferences']['voice_enabled'] == 'false'
+        assert preferences_model.get_preferences(user_id)['voice_enabled'] == 'false'
 
-    def test_delete_preference(self, client, auth_headers):
+    def test_delete_preference(self, client, auth_headers, user_id):
         """Should delete a preference"""
         # Set a preference first
         client.put('/api/preferences/custom_key',
@@ -253,9 +313,7 @@ class TestPreferences:
         assert response.status_code == 200
 
         # Verify it was deleted
-        response = client.get('/api/preferences', headers=auth_headers)
-        data = response.get_json()
-        assert 'custom_key' not in data['preferences']
+        assert 'custom_key' not in preferences_model.get_preferences(user_id)
 
     def test_preferences_require_auth(self, client):
         """Should require authentication for preferences"""
@@ -275,7 +333,7 @@ class TestPresets:
         assert 'presets' in data
         assert len(data['presets']) == 0
 
-    def test_create_preset(self, client, auth_headers):
+    def test_create_preset(self, client, auth_headers, user_id):
         """Should create a new preset"""
         response = client.post('/api/presets', headers=auth_headers, json={
             'name': 'Quick Break',
@@ -289,11 +347,10 @@ class TestPresets:
         assert 'preset_id' in data
 
         # Verify preset was created
-        response = client.get('/api/presets', headers=auth_headers)
-        data = response.get_json()
-        assert len(data['presets']) == 1
-        assert data['presets'][0]['name'] == 'Quick Break'
-        assert data['presets'][0]['minutes'] == 5
+        presets = presets_model.get_presets(user_id)
+        assert len(presets) == 1
+        assert presets[0]['name'] == 'Quick Break'
+        assert presets[0]['minutes'] == 5
 
     def test_create_preset_validation(self, client, auth_headers):
         """Should validate preset time values"""
@@ -315,7 +372,14 @@ class TestPresets:
         })
         assert response.status_code == 400
 
-    def test_update_preset(self, client, auth_headers):
+        # Non-numeric seconds
+        response = client.post('/api/presets', headers=auth_headers, json={
+            'name': 'Invalid',
+            'seconds': 'ten'
+        })
+        assert response.status_code == 400
+
+    def test_update_preset(self, client, auth_headers, user_id):
         """Should update a preset"""
         # Create preset
         response = client.post('/api/presets', headers=auth_headers, json={
@@ -339,14 +403,12 @@ class TestPresets:
         assert response.status_code == 200
 
         # Verify update
-        response = client.get('/api/presets', headers=auth_headers)
-        data = response.get_json()
-        preset = data['presets'][0]
+        preset = presets_model.get_presets(user_id)[0]
         assert preset['name'] == 'Updated'
         assert preset['minutes'] == 15
         assert preset['seconds'] == 30
 
-    def test_delete_preset(self, client, auth_headers):
+    def test_delete_preset(self, client, auth_headers, user_id):
         """Should delete a preset"""
         # Create preset
         response = client.post('/api/presets', headers=auth_headers, json={
@@ -364,9 +426,21 @@ class TestPresets:
         assert response.status_code == 200
 
         # Verify deletion
+        assert presets_model.get_presets(user_id) == []
+
+    def test_get_presets_not_modified(self, client, auth_headers):
+        """Should return 304 when the presets are unchanged"""
         response = client.get('/api/presets', headers=auth_headers)
-        data = response.get_json()
-        assert len(data['presets']) == 0
+        etag = response.headers['ETag']
+
+        response = client.get('/api/presets', headers={**auth_headers, 'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+        client.post('/api/presets', headers=auth_headers, json={'name': 'Tea', 'minutes': 3})
+        response = client.get('/api/presets', headers={**auth_headers, 'If-None-Match': etag})
+        assert response.status_code == 200
+        assert len(response.get_json()['presets']) == 1
 
     def test_presets_require_auth(self, client):
         """Should require authentication for presets"""
@@ -374,6 +448,437 @@ class TestPresets:
         assert response.status_code == 401
 
 
+class TestSupabaseClient:
+    """Test the shared Supabase client"""
+
+    def test_failed_init_is_retried(self, monkeypatch):
+        """Should retry client creation after a failure and then reuse the client"""
+        attempts = []
+
+        def create_client(supabase_key):
+            attempts.append(supabase_key)
+            if len(attempts) == 1:
+                raise RuntimeError('temporary failure')
+            return object()
+
+        monkeypatch.setenv('SUPABASE_URL', 'https://example.supabase.co')
+        monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'service-key')
+        monkeypatch.setattr(supabase_client, '_clients', {})
+        monkeypatch.setattr(supabase_client, '_create_client', create_client)
+
+        assert supabase_client.get_supabase() is None
+        first = supabase_client.get_supabase()
+        assert first is not None
+        assert supabase_client.get_supabase() is first
+        assert attempts == ['service-key', 'service-key']
+
+
+class TestSupabaseSession:
+    """Test Supabase session verification endpoints"""
+
+    @pytest.mark.parametrize('header', ['', 'Bearer', 'Bearer ', 'Basic abc'])
+    def test_verify_session_requires_bearer_token(self, client, header):
+        """Should reject requests without a bearer token"""
+        response = client.post('/api/auth/verify-session', headers={'Authorization': header})
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'No authorization token provided'
+
+    def test_verify_session_is_cached(self, client, monkeypatch):
+        """Should only ask Supabase once for repeated checks of the same token"""
+        calls = []
+
+        def get_user(token):
+            calls.append(token)
+            return SimpleNamespace(user=SimpleNamespace(
+                id='user-1', email='test@example.com', user_metadata={'username': 'testuser'},
+                created_at='2024-01-01T00:00:00Z', email_confirmed_at=None
+            ))
+
+        monkeypatch.setattr(supabase_auth, 'get_supabase_client', lambda: SimpleNamespace(auth=SimpleNamespace(get_user=get_user)))
+        monkeypatch.setattr(supabase_auth, '_session_cache', supabase_auth.TTLCache(maxsize=10, ttl=30))
+        monkeypatch.setattr(supabase_auth, 'decode_access_token', lambda token: None)
+        headers = {'Authorization': 'Bearer session-token'}
+
+        response = client.post('/api/auth/verify-session', headers=headers)
+        assert response.get_json() == {'valid': True, 'user_id': 'user-1', 'email': 'test@example.com'}
+
+        response = client.get('/api/auth/user-profile', headers=headers)
+        assert response.get_json()['username'] == 'testuser'
+        assert calls == ['session-token']
+
+    def test_concurrent_session_lookups_are_shared(self, monkeypatch):
+        """Should make one Supabase call for simultaneous checks of the same token"""
+        calls = []
+
+        def get_user(token):
+            calls.append(token)
+            time.sleep(0.1)
+            return SimpleNamespace(user=SimpleNamespace(
+                id='user-1', email='test@example.com', user_metadata={},
+                created_at='2024-01-01T00:00:00Z', email_confirmed_at=None
+            ))
+
+        monkeypatch.setattr(supabase_auth, 'get_supabase_client', lambda: SimpleNamespace(auth=SimpleNamespace(get_user=get_user)))
+        monkeypatch.setattr(supabase_auth, '_session_cache', supabase_auth.TTLCache(maxsize=10, ttl=30))
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(supabase_auth.get_session_user('shared-token')))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == ['shared-token']
+        assert [user['id'] for user in results] == ['user-1'] * 4
+
+    def test_verify_session_locally(self, client, monkeypatch):
+        """Should verify signed tokens without calling Supabase"""
+        def get_user(token):
+            raise AssertionError('Supabase auth API should not be called')
+
+        monkeypatch.setattr(supabase_auth, 'get_supabase_client', lambda: SimpleNamespace(auth=SimpleNamespace(get_user=get_user)))
+        monkeypatch.setenv('SUPABASE_JWT_SECRET', 'project-jwt-secret')
+        token = supabase_auth.jwt.encode({
+            'sub': 'user-2', 'email': 'local@example.com', 'aud': 'authenticated', 'exp': int(time.time()) + 60
+        }, 'project-jwt-secret', algorithm='HS256')
+
+        response = client.post('/api/auth/verify-session', headers={'Authorization': f'Bearer {token}'})
+        assert response.get_json() == {'valid': True, 'user_id': 'user-2', 'email': 'local@example.com'}
+
+        forged = supabase_auth.jwt.encode({
+            'sub': 'user-2', 'aud': 'authenticated', 'exp': int(time.time()) + 60
+        }, 'wrong-secret', algorithm='HS256')
+        response = client.post('/api/auth/verify-session', headers={'Authorization': f'Bearer {forged}'})
+        assert response.status_code == 401
+
+
+class TestUsernameCheck:
+    """Test username availability endpoint"""
+
+    def test_check_usernames_in_one_query(self, client, monkeypatch):
+        """Should look up a batch of usernames with a single query"""
+        queries = []
+
+        class Profiles:
+            def select(self, columns):
+                return self
+
+            def in_(self, column, values):
+                queries.append(values)
+                return self
+
+            def execute(self):
+                return SimpleNamespace(data=[{'username': 'taken'}])
+
+        fake_client = SimpleNamespace(table=lambda name: Profiles())
+        monkeypatch.setattr(supabase_auth, 'get_supabase', lambda: fake_client)
+
+        response = client.post('/api/auth/check-username', json={'usernames': ['taken', 'free']})
+        assert response.get_json() == {'results': {'taken': False, 'free': True}}
+
+        response = client.post('/api/auth/check-username', json={'username': 'taken'})
+        assert response.get_json() == {'available': False}
+        assert queries == [['taken', 'free'], ['taken']]
+
+    @pytest.mark.parametrize('body', [{'username': None}, {'usernames': ['ok', 42]}])
+    def test_non_string_usernames_are_rejected(self, client, body):
+        """Should refuse usernames that aren't strings"""
+        response = client.post('/api/auth/check-username', json=body)
+        assert response.status_code == 400
+
+    def test_missing_profiles_table_is_queried_once(self, client, monkeypatch):
+        """Should stop querying once the profiles table is known to be missing"""
+        queries = []
+
+        def execute():
+            queries.append(1)
+            raise APIError({'code': '42P01', 'message': 'relation "profiles" does not exist'})
+
+        profiles = SimpleNamespace(select=lambda columns: profiles, in_=lambda column, values: profiles, execute=execute)
+        monkeypatch.setattr(supabase_auth, 'get_supabase', lambda: SimpleNamespace(table=lambda name: profiles))
+        monkeypatch.setattr(supabase_auth, '_profiles_table_missing', False)
+
+        for _ in range(2):
+            response = client.post('/api/auth/check-username', json={'username': 'someone'})
+            assert response.get_json() == {'available': True}
+        assert queries == [1]
+
+
+class TestStripeWebhook:
+    """Test Stripe webhook endpoint"""
+
+    secret = 'whsec_test'
+
+    def signed_headers(self, payload):
+        """Build a Stripe-Signature header for the payload"""
+        timestamp = int(time.time())
+        signature = hmac.new(
+            self.secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256
+        ).hexdigest()
+        return {'Stripe-Signature': f't={timestamp},v1={signature}', 'Content-Type': 'application/json'}
+
+    def test_webhook_acknowledges_and_queues_event(self, client, monkeypatch):
+        """Should return 200 immediately and handle the event in the background"""
+        handled = []
+        monkeypatch.setattr(stripe_routes, 'WEBHOOK_SECRET', self.secret)
+        monkeypatch.setattr(stripe_routes, '_webhook_secret_bytes', self.secret.encode())
+        monkeypatch.setattr(stripe_routes, 'dispatch_event', lambda event_type, data: handled.append(event_type))
+
+        payload = json.dumps({
+            'id': 'evt_test',
+            'object': 'event',
+            'type': 'invoice.payment_succeeded',
+            'data': {'object': {'id': 'in_test'}}
+        })
+        response = client.post('/api/stripe/webhook', data=payload, headers=self.signed_headers(payload))
+        assert response.status_code == 200
+
+        # Wait for the background worker to drain the queue
+        stripe_routes._webhook_executor.submit(lambda: None).result(timeout=5)
+        assert handled == ['invoice.payment_succeeded']
+
+    def test_webhook_applies_event_inline_on_vercel(self, client, monkeypatch):
+        """Should apply the event before responding on serverless deployments"""
+        handled = []
+        monkeypatch.setattr(stripe_routes, 'WEBHOOK_INLINE', True)
+        monkeypatch.setattr(stripe_routes, 'WEBHOOK_SECRET', self.secret)
+        monkeypatch.setattr(stripe_routes, '_webhook_secret_bytes', self.secret.encode())
+        monkeypatch.setattr(stripe_routes, 'dispatch_event', lambda event_type, data: handled.append(event_type))
+        monkeypatch.setattr(stripe_routes._webhook_executor, 'submit', lambda fn: pytest.fail('event was queued'))
+
+        payload = json.dumps({
+            'id': 'evt_test',
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {'object': {'id': 'cs_test'}}
+        })
+        response = client.post('/api/stripe/webhook', data=payload, headers=self.signed_headers(payload))
+        assert response.status_code == 200
+        assert handled == ['checkout.session.completed']
+
+    def test_fast_signature_check_matches_stripe(self, monkeypatch):
+        """Should accept exactly the headers Stripe's own verification accepts"""
+        monkeypatch.setattr(stripe_routes, '_webhook_secret_bytes', self.secret.encode())
+
+        payload = '{"id": "evt_test"}'
+        header = self.signed_headers(payload)['Stripe-Signature']
+        assert stripe_routes._verify_signature_fast(payload, header)
+        assert not stripe_routes._verify_signature_fast(payload + ' ', header)
+        assert not stripe_routes._verify_signature_fast(payload, header + ',v1=deadbeef')
+
+    def test_webhook_rejects_non_ascii_signature(self, client, monkeypatch):
+        """Should answer 400, not 500, for a non-ASCII signature"""
+        monkeypatch.setattr(stripe_routes, 'WEBHOOK_SECRET', self.secret)
+        monkeypatch.setattr(stripe_routes, '_webhook_secret_bytes', self.secret.encode())
+
+        payload = json.dumps({'id': 'evt_test', 'object': 'event', 'type': 'invoice.payment_failed'})
+        assert not stripe_routes._verify_signature_fast(payload, 't=9999999999,v1=é')
+
+        headers = {'Stripe-Signature': 't=9999999999,v1=é'}
+        response = client.post('/api/stripe/webhook', data=payload, headers=headers)
+        assert response.status_code == 400
+
+    def test_webhook_rejects_bad_signature(self, client, monkeypatch):
+        """Should reject events with an invalid signature"""
+        monkeypatch.setattr(stripe_routes, 'WEBHOOK_SECRET', self.secret)
+        monkeypatch.setattr(stripe_routes, '_webhook_secret_bytes', self.secret.encode())
+
+        payload = json.dumps({'id': 'evt_test', 'object': 'event', 'type': 'invoice.payment_failed'})
+        headers = {'Stripe-Signature': f't={int(time.time())},v1=deadbeef'}
+        response = client.post('/api/stripe/webhook', data=payload, headers=headers)
+        assert response.status_code == 400
+
+
+class TestAdminPagination:
+    """Test keyset pagination of admin history and activity"""
+
+    class FakeQuery:
+        """Stand-in for a PostgREST select that records its query params"""
+
+        def __init__(self, rows):
+            self.rows = rows
+            self.params = httpx.QueryParams()
+
+        def limit(self, size):
+            self.params = self.params.add('limit', size)
+            self.size = size
+            return self
+
+        def execute(self):
+            return SimpleNamespace(data=self.rows[:self.size])
+
+    def test_cursor_breaks_created_at_ties_by_id(self):
+        """Should page on (created_at, id) so rows sharing a timestamp aren't skipped"""
+        created_at = '2024-05-01T12:00:00.123456+00:00'
+        ids = sorted((str(uuid.uuid4()) for _ in range(3)), reverse=True)
+        rows = [{'id': row_id, 'created_at': created_at} for row_id in ids]
+
+        page, next_cursor = admin_routes._fetch_page(self.FakeQuery(rows), None, 2)
+        assert next_cursor == f'{created_at}|{ids[1]}'
+
+        query = self.FakeQuery(rows[2:])
+        page, next_cursor = admin_routes._fetch_page(query, next_cursor, 2)
+        assert page == rows[2:] and next_cursor is None
+        assert query.params['or'] == (
+            f'(created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{ids[1]}))'
+        )
+        assert query.params['order'] == 'created_at.desc,id.desc'
+
+    @pytest.mark.parametrize('cursor', ['garbage', '2024-05-01T12:00:00+00:00|not-a-uuid', f'"),id.gt.0|{uuid.uuid4()}'])
+    def test_malformed_cursor_is_rejected(self, cursor):
+        """Should refuse cursors that aren't a timestamp and a UUID"""
+        with pytest.raises(ValueError):
+            admin_routes._fetch_page(self.FakeQuery([]), cursor, 20)
+
+    @pytest.mark.parametrize('limit, expected', [('0', 1), ('-5', 1), ('1000', 100), ('abc', 20)])
+    def test_page_limit_is_clamped(self, limit, expected):
+        """Should keep ?limit= between 1 and 100"""
+        with app.test_request_context(f'/?limit={limit}'):
+            assert admin_routes._page_limit(20) == expected
+
+
+class TestAdminTokens:
+    """Test admin token signing and verification"""
+
+    secret = 'admin-test-secret'
+
+    @pytest.fixture(autouse=True)
+    def secret_key(self, monkeypatch):
+        monkeypatch.setenv('SECRET_KEY', self.secret)
+
+    def claims(self, **overrides):
+        """Admin token claims that expire in an hour"""
+        now = int(time.time())
+        return {'admin_id': 'admin-1', 'email': 'admin@example.com', 'exp': now + 3600, 'iat': now, **overrides}
+
+    def test_token_round_trip(self):
+        """Should issue standard HS256 tokens that verify_token accepts"""
+        token = admin_routes.generate_token('admin-1', 'admin@example.com')
+
+        decoded = jwt.decode(token, self.secret, algorithms=['HS256'])
+        assert decoded['admin_id'] == 'admin-1'
+        assert decoded['exp'] - decoded['iat'] == admin_routes.TOKEN_LIFETIME_SECONDS
+        assert admin_routes.verify_token(token) == decoded
+
+    def test_tampered_token_is_rejected(self):
+        """Should reject a token whose payload was changed after signing"""
+        header, _, signature = admin_routes.generate_token('admin-1', 'admin@example.com').split('.')
+        forged = admin_routes._b64url(json.dumps(self.claims(admin_id='admin-2')).encode()).decode()
+        assert admin_routes.verify_token(f'{header}.{forged}.{signature}') is None
+
+    def test_unsigned_token_is_rejected(self):
+        """Should reject alg: none tokens"""
+        header = admin_routes._b64url(b'{"alg":"none","typ":"JWT"}').decode()
+        payload = admin_routes._b64url(json.dumps(self.claims()).encode()).decode()
+        assert admin_routes.verify_token(f'{header}.{payload}.') is None
+
+    @pytest.mark.parametrize('key, overrides', [
+        ('wrong-secret', {}),
+        (secret, {'exp': int(time.time()) - 10}),
+        (secret, {'exp': time.time() + 3600.5}),
+        (secret, {'exp': None}),
+    ])
+    def test_invalid_token_is_rejected(self, key, overrides):
+        """Should reject tokens with the wrong key, or an expired or malformed exp"""
+        claims = {k: v for k, v in self.claims(**overrides).items() if v is not None}
+        token = jwt.encode(claims, key, algorithm='HS256')
+        assert admin_routes.verify_token(token) is None
+
+
+class TestAdminPasswords:
+    """Test admin password verification"""
+
+    def test_successful_verify_is_cached(self, monkeypatch):
+        """Should skip Argon2 for a recently verified password"""
+        password_hash = admin_routes.hash_password('correct horse')
+        assert admin_routes.verify_password('correct horse', password_hash)
+
+        def verify(*args):
+            pytest.fail('hash was rechecked')
+
+        monkeypatch.setattr(admin_routes, 'password_hasher', SimpleNamespace(verify=verify))
+        assert admin_routes.verify_password('correct horse', password_hash)
+
+    def test_wrong_password_is_rejected(self):
+        """Should reject a wrong password, even after the right one was cached"""
+        password_hash = admin_routes.hash_password('correct horse')
+        assert admin_routes.verify_password('correct horse', password_hash)
+        assert not admin_routes.verify_password('battery staple', password_hash)
+
+    def test_legacy_sha256_hash(self):
+        """Should still accept unsalted SHA-256 hashes from before Argon2"""
+        legacy_hash = hashlib.sha256(b'old password').hexdigest()
+        assert admin_routes.verify_password('old password', legacy_hash)
+        assert not admin_routes.verify_password('new password', legacy_hash)
+
+    def test_invalid_hash_is_rejected(self):
+        """Should reject a malformed Argon2 hash instead of raising"""
+        assert not admin_routes.verify_password('anything', '$argon2id$v=19$not-a-hash')
+
+
+class TestAdminAIGenerate:
+    """Test AI provider and model selection"""
+
+    @pytest.mark.parametrize('value, provider', [
+        ('gemini', 'gemini'),
+        (' Anthropic ', 'anthropic'),
+        ('openai', 'gemini'),
+        ('', 'gemini'),
+    ])
+    def test_provider_is_normalized(self, value, provider):
+        """Should accept any casing and fall back to gemini for unknown providers"""
+        assert admin_routes._resolve_ai_provider(value) == provider
+
+    @pytest.mark.parametrize('model', [None, 42, 'claude-3-opus'])
+    def test_unusable_model_uses_default(self, client, monkeypatch, model):
+        """Should fall back to the provider's default model"""
+        used = []
+        monkeypatch.setenv('SECRET_KEY', 'admin-test-secret')
+        monkeypatch.setattr(admin_routes, 'AI_PROVIDER', 'gemini')
+        monkeypatch.setattr(admin_routes, 'get_ai_client', lambda: object())
+        monkeypatch.setattr(admin_routes, '_generate_chunks', lambda prompt, model_name, max_tokens: used.append(model_name) or ['hi'])
+        monkeypatch.setattr(admin_routes, '_record_generation', lambda *args: None)
+
+        token = admin_routes.generate_token('admin-1', 'admin@example.com')
+        response = client.post('/api/admin/ai/generate', headers={'Authorization': f'Bearer {token}'},
+                               json={'prompt': 'Write a haiku', 'model': model})
+        assert response.status_code == 200
+        assert used == [admin_routes.AI_DEFAULT_MODELS['gemini']]
+
+
+class TestAdminServerlessWrites:
+    """Test that admin writes don't wait on a background worker on Vercel"""
+
+    @pytest.fixture(autouse=True)
+    def inline(self, monkeypatch):
+        monkeypatch.setattr(admin_routes, 'WRITE_INLINE', True)
+        monkeypatch.setattr(admin_routes._log_executor, 'submit', lambda *args: pytest.fail('write was queued'))
+
+    def test_generation_is_saved_inline(self, monkeypatch):
+        """Should store the AI history row before responding"""
+        saved = []
+        monkeypatch.setattr(admin_routes, 'save_generated_content', lambda *args: saved.append(args))
+        monkeypatch.setattr(admin_routes, 'log_activity', lambda *args: None)
+
+        with app.test_request_context('/'):
+            admin_routes.request.admin_id = 'admin-1'
+            admin_routes._record_generation('prompt', 'content', 'gemini-test')
+        assert saved == [('admin-1', 'prompt', 'content', 'gemini-test')]
+
+    def test_activity_is_flushed_inline(self, monkeypatch):
+        """Should insert the activity log entry before responding"""
+        inserted = []
+        table = SimpleNamespace(insert=lambda rows: SimpleNamespace(execute=lambda: inserted.extend(rows)))
+        monkeypatch.setattr(admin_routes, 'get_supabase', lambda: SimpleNamespace(table=lambda name: table))
+
+        with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            admin_routes.log_activity('admin-1', 'login', {'ok': True})
+        assert inserted == [{'admin_id': 'admin-1', 'action': 'login', 'details': {'ok': True}, 'ip_address': '10.0.0.1'}]
+
+
 def run_tests():
     """Run all tests and print results"""
     print('\n' + '='*70)
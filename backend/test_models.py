@@ -0,0 +1,169 @@
+"""
+Model Tests for Countdown Timer
+Tests core models and database operations without the Flask test client
+"""
+import pytest
+from models import Database, User, UserPreferences, UserPresets
+
+
+@pytest.fixture(scope='module')
+def db():
+    """Create one in-memory database shared by every test in this module"""
+    database = Database(':memory:')
+    yield database
+    database.close_all()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables(db):
+    """Start every test from empty tables"""
+    with db.transaction():
+        for table in ('user_presets', 'user_preferences', 'users'):
+            db.execute_write(f'DELETE FROM {table}')
+
+
+@pytest.fixture
+def user_model(db):
+    return User(db)
+
+
+@pytest.fixture
+def prefs_model(db):
+    return UserPreferences(db, cache_ttl=0)
+
+
+@pytest.fixture
+def presets_model(db):
+    return UserPresets(db)
+
+
+@pytest.fixture
+def user_id(user_model):
+    """Create the test user and return its ID"""
+    return user_model.create_user('testuser', 'test@example.com', 'password123')
+
+
+class TestDatabase:
+    """Test database setup"""
+
+    @pytest.mark.parametrize('table', ['users', 'user_preferences', 'user_presets'])
+    def test_tables_created(self, db, table):
+        """Should create the required tables"""
+        results = db.execute_query("SELECT name FROM sqlite_master WHERE type='table' AND name = ?", (table,))
+        assert len(results) == 1
+
+    def test_transaction_rolls_back_on_error(self, db, presets_model, user_id):
+        """Should discard every write from a failed transaction"""
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                presets_model.create_preset(user_id, 'Discarded', 0, 2, 0)
+                raise RuntimeError('abort')
+
+        assert presets_model.get_presets(user_id) == []
+
+
+class TestUser:
+    """Test user model"""
+
+    def test_create_user(self, user_id):
+        """Should return the new user's ID"""
+        assert user_id and user_id > 0
+
+    def test_get_user_by_username(self, user_model, user_id):
+        """Should find the user by username"""
+        user = user_model.get_user_by_username('testuser')
+        assert user['id'] == user_id
+
+    @pytest.mark.parametrize('password, valid', [
+        ('password123', True),
+        ('wrongpassword', False),
+    ])
+    def test_verify_password(self, user_model, user_id, password, valid):
+        """Should accept only the correct password"""
+        user = user_model.verify_password('testuser', password)
+        assert (user is not None) == valid
+
+    def test_prevent_duplicate_username(self, user_model, user_id):
+        """Should refuse a second user with the same username"""
+        assert user_model.create_user('testuser', 'another@example.com', 'pass') is None
+
+
+class TestUserPreferences:
+    """Test user preferences model"""
+
+    @pytest.mark.parametrize('values', [['true'], ['true', 'false']])
+    def test_set_preference(self, prefs_model, user_id, values):
+        """Should store a preference, keeping the latest value"""
+        for value in values:
+            prefs_model.set_preference(user_id, 'voice_enabled', value)
+        assert prefs_model.get_preferences(user_id) == {'voice_enabled': values[-1]}
+
+    def test_set_multiple_preferences(self, prefs_model, user_id):
+        """Should store several preferences at once"""
+        preferences = {'default_hours': '1', 'default_minutes': '30', 'custom_setting': 'test_value'}
+        prefs_model.set_multiple_preferences(user_id, preferences)
+        assert prefs_model.get_preferences(user_id) == preferences
+
+    def test_delete_preference(self, prefs_model, user_id):
+        """Should remove only the deleted preference"""
+        prefs_model.set_multiple_preferences(user_id, {'default_hours': '1', 'custom_setting': 'test_value'})
+        prefs_model.delete_preference(user_id, 'custom_setting')
+        assert prefs_model.get_preferences(user_id) == {'default_hours': '1'}
+
+    def test_cache_skips_rows_read_before_a_write(self, db, user_id, monkeypatch):
+        """Should not cache rows a concurrent write made stale"""
+        prefs = UserPreferences(db, cache_ttl=60)
+        prefs.set_preference(user_id, 'voice_enabled', 'true')
+
+        execute_query = db.execute_query
+
+        def racing_query(*args):
+            rows = execute_query(*args)
+            monkeypatch.setattr(db, 'execute_query', execute_query)
+            prefs.set_preference(user_id, 'voice_enabled', 'false')
+            return rows
+
+        monkeypatch.setattr(db, 'execute_query', racing_query)
+        assert prefs.get_preferences(user_id) == {'voice_enabled': 'true'}
+        assert prefs.get_preferences(user_id) == {'voice_enabled': 'false'}
+
+    @pytest.mark.parametrize('workers, cached', [('1', True), ('2', False)])
+    def test_cache_default_depends_on_workers(self, db, monkeypatch, workers, cached):
+        """Should only cache by default when running a single worker"""
+        monkeypatch.delenv('PREFERENCES_CACHE_TTL', raising=False)
+        monkeypatch.setenv('WEB_CONCURRENCY', workers)
+        assert (UserPreferences(db)._cache is not None) == cached
+
+
+class TestUserPresets:
+    """Test user timer presets model"""
+
+    def test_create_and_get_preset(self, presets_model, user_id):
+        """Should create a preset and list it"""
+        preset_id = presets_model.create_preset(user_id, 'Quick Break', 0, 5, 0)
+        assert preset_id and preset_id > 0
+
+        presets = presets_model.get_presets(user_id)
+        assert [preset['name'] for preset in presets] == ['Quick Break']
+
+    def test_update_preset(self, presets_model, user_id):
+        """Should update a preset's name and time"""
+        preset_id = presets_model.create_preset(user_id, 'Quick Break', 0, 5, 0)
+        presets_model.update_preset(user_id, preset_id, 'Long Break', 0, 15, 30)
+
+        preset = presets_model.get_presets(user_id)[0]
+        assert (preset['name'], preset['minutes'], preset['seconds']) == ('Long Break', 15, 30)
+
+    def test_create_presets_bulk(self, presets_model, user_id):
+        """Should create several presets at once"""
+        presets_model.create_presets_bulk(user_id, [('Short Timer', 0, 1, 0), ('Pomodoro', 0, 25, 0)])
+        names = {preset['name'] for preset in presets_model.get_presets(user_id)}
+        assert names == {'Short Timer', 'Pomodoro'}
+
+    def test_delete_preset(self, presets_model, user_id):
+        """Should delete only the given preset"""
+        preset_id = presets_model.create_preset(user_id, 'Quick Break', 0, 5, 0)
+        presets_model.create_preset(user_id, 'Pomodoro', 0, 25, 0)
+        presets_model.delete_preset(user_id, preset_id)
+
+        assert [preset['name'] for preset in presets_model.get_presets(user_id)] == ['Pomodoro']
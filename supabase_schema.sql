@@ -47,6 +47,14 @@ CREATE INDEX IF NOT EXISTS idx_admin_sessions_expires ON admin_sessions(expires_
 CREATE INDEX IF NOT EXISTS idx_ai_content_admin ON ai_generated_content(admin_id);
 CREATE INDEX IF NOT EXISTS idx_activity_log_admin ON admin_activity_log(admin_id);
 CREATE INDEX IF NOT EXISTS idx_activity_log_created ON admin_activity_log(created_at DESC);
+-- id breaks created_at ties for the (created_at, id) pagination cursor
+CREATE INDEX IF NOT EXISTS idx_ai_content_admin_created ON ai_generated_content(admin_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_activity_log_admin_created ON admin_activity_log(admin_id, created_at DESC, id DESC);
+
+-- History list view with a short preview instead of the full generated content
+CREATE OR REPLACE VIEW ai_history_preview WITH (security_invoker = true) AS
+SELECT id, admin_id, prompt, left(generated_content, 300) AS preview, model, created_at
+FROM ai_generated_content;
 
 -- RLS (Row Level Security) Policies
 ALTER TABLE admin_users ENABLE ROW LEVEL SECURITY;
@@ -88,6 +96,22 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Function to record a successful admin login in one round trip
+-- Updates last_login and writes the activity log entry in a single transaction
+CREATE OR REPLACE FUNCTION admin_record_login(p_admin_id UUID, p_ip TEXT, p_details JSONB)
+RETURNS void AS $$
+BEGIN
+    UPDATE admin_users SET last_login = now() WHERE id = p_admin_id;
+    INSERT INTO admin_activity_log (admin_id, action, details, ip_address)
+    VALUES (p_admin_id, 'login', COALESCE(p_details, '{}'::jsonb), p_ip);
+END;
+$$ language 'plpgsql';
+
+-- Only the backend (service role) may call it; otherwise any client could
+-- write admin activity rows through PostgREST RPC
+REVOKE EXECUTE ON FUNCTION admin_record_login(UUID, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION admin_record_login(UUID, TEXT, JSONB) TO service_role;
+
 -- Note: Run this to create the first admin user (after replacing with bcrypt hash):
 -- INSERT INTO admin_users (email, password_hash, full_name, is_active)
 -- VALUES ('admin@example.com', 'YOUR_BCRYPT_HASH_HERE', 'System Administrator', true);